@@ -0,0 +1,300 @@
+import asyncio
+import collections
+import json
+
+from downloader import (
+    DownloadOutput,
+    YTVideoDownloader,
+    download_result,
+    get_bin_paths,
+    remove_staging_dir,
+    skipped_result,
+)
+from performance import DEFAULT_PROFILE, resolve_performance
+from process_control import (
+    hidden_startupinfo,
+    kill_process_tree,
+    process_group_kwargs,
+)
+from progress_throttle import TERMINAL_STATUSES
+
+# Download output is read line by line, and StreamReader fails a line longer
+# than its limit (64 KiB by default); yt-dlp's error and warning lines can
+# exceed that. get_formats reads with communicate(), which has no limit.
+STREAM_LIMIT = 16 * 1024 * 1024
+
+class AsyncDownload:
+    """A running download: an async iterator of progress dicts and an awaitable.
+
+    ``async for d in job`` yields the same dicts ``progress_hook`` receives
+    from YTVideoDownloader; ``await job`` returns the result dict.
+    ``cancel()`` kills the yt-dlp child and removes its staging dir.
+
+    Updates are coalesced as in ProgressThrottle: while the iterator is
+    not being read, a newer update with the same status replaces the one
+    waiting, so only status changes and the latest state are kept, and
+    a job that is only awaited holds a single update.
+    """
+
+    def __init__(self, downloader, url, format_string, info, performance, force=False):
+        self.url = url
+        # (status, event) pairs not read yet; events are dicts or progress
+        # records, turned into dicts when they are read
+        self._events = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(
+            downloader._run_download(
+                url, format_string, info, performance, force, self._emit
+            )
+        )
+        self._task.add_done_callback(lambda _: self._wakeup.set())
+
+    def _emit(self, event):
+        if isinstance(event, dict):
+            status = event.get("status")
+        else:
+            status = event.hook_status
+        if self._events:
+            last_status, last = self._events[-1]
+            if last is event or (
+                last_status == status and status not in TERMINAL_STATUSES
+            ):
+                self._events[-1] = (status, event)
+                return
+        self._events.append((status, event))
+        self._wakeup.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._events:
+            if self._task.done():
+                raise StopAsyncIteration
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        _, event = self._events.popleft()
+        return event if isinstance(event, dict) else event.as_dict()
+
+    def __await__(self):
+        return self._task.__await__()
+
+    def cancel(self):
+        return self._task.cancel()
+
+    def done(self):
+        return self._task.done()
+
+
+class AsyncYTVideoDownloader:
+    """asyncio counterpart of YTVideoDownloader.
+
+    yt-dlp children are started with ``asyncio.create_subprocess_exec`` and
+    at most ``max_concurrent`` run at once; everything else waits on a
+    semaphore, so queued jobs cost only a coroutine each. Cancelling a
+    call kills its child process. The metadata cache, the download archive
+    and the staging dirs are blocking file and SQLite I/O, so those calls
+    run in a worker thread (``asyncio.to_thread``), off the event loop.
+    """
+
+    def __init__(
+        self,
+        browsers=None,
+        download_dir=None,
+        max_concurrent=3,
+        use_cache=True,
+        metadata_cache=None,
+        performance=DEFAULT_PROFILE,
+        use_archive=True,
+        download_archive=None,
+    ):
+        # The blocking downloader is only used for command building, the
+        # staging dirs, the metadata cache and the download archive; it
+        # never starts a process.
+        self._sync = YTVideoDownloader(
+            browsers=browsers,
+            download_dir=download_dir,
+            use_cache=use_cache,
+            metadata_cache=metadata_cache,
+            performance=performance,
+            backend="subprocess",
+            use_archive=use_archive,
+            download_archive=download_archive,
+        )
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+    @property
+    def download_dir(self):
+        return self._sync.download_dir
+
+    async def _spawn(self, cmd):
+        return await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+            startupinfo=hidden_startupinfo(),
+            **process_group_kwargs(),
+        )
+
+    async def _kill(self, process):
+        if process.returncode is None:
+            kill_process_tree(process.pid)
+            await process.wait()
+
+    async def get_formats(self, url, refresh=False, timeout=60):
+        if not refresh:
+            info = await asyncio.to_thread(self._sync._cached_info, url)
+            if info is not None:
+                return {
+                    "status": True,
+                    "formats": info.get("formats", []),
+                    "info": info,
+                    "cached": True,
+                }
+
+        yt_dlp, _ = get_bin_paths()
+        if not yt_dlp.exists():
+            return {"status": False, "message": "yt-dlp.exe not found in bin folder"}
+
+        cmd = [str(yt_dlp), url, "-J"]
+        for browser in self._sync.browsers:
+            cmd.extend(["--cookies-from-browser", browser])
+
+        async with self._semaphore:
+            process = None
+            try:
+                process = await self._spawn(cmd)
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                return {"status": False, "message": "Request timed out"}
+            except OSError as e:
+                return {"status": False, "message": str(e)}
+            finally:
+                if process is not None:
+                    await asyncio.shield(self._kill(process))
+
+        if process.returncode != 0:
+            message = stderr.decode("utf-8", "replace")
+            return {"status": False, "message": f"Failed to fetch formats: {message}"}
+        try:
+            info = json.loads(stdout)
+        except ValueError:
+            return {"status": False, "message": "Failed to parse format data"}
+
+        await asyncio.to_thread(self._sync._store_info, url, info)
+        return {
+            "status": True,
+            "formats": info.get("formats", []),
+            "info": info,
+            "cached": False,
+        }
+
+    def download(
+        self, url, format_string=None, info=None, performance=None, force=False
+    ):
+        """Start a download and return its AsyncDownload handle."""
+        return AsyncDownload(self, url, format_string, info, performance, force)
+
+    async def download_video(
+        self,
+        url,
+        format_string=None,
+        info=None,
+        performance=None,
+        progress_hook=None,
+        force=False,
+    ):
+        """Download ``url`` and return the result dict.
+
+        ``progress_hook`` is called on the loop with the latest progress
+        dict whenever it gets to run (see AsyncDownload).
+        Videos in the download archive are skipped unless ``force`` is set.
+        """
+        job = self.download(url, format_string, info, performance, force)
+        try:
+            async for d in job:
+                if progress_hook:
+                    progress_hook(d)
+            return await job
+        finally:
+            job.cancel()
+
+    async def _run_download(
+        self, url, format_string, info, performance, force, emit
+    ):
+        if not force:
+            entry = await asyncio.to_thread(self._sync.find_downloaded, url, info)
+            if entry is not None:
+                return skipped_result(entry)
+        async with self._semaphore:
+            staging_dir = None
+            process = None
+            try:
+                yt_dlp, ffmpeg = get_bin_paths()
+                settings = resolve_performance(self._sync.performance, performance)
+
+                if not yt_dlp.exists():
+                    return {
+                        "status": False,
+                        "message": "yt-dlp.exe not found",
+                        "filepath": None,
+                    }
+                if format_string in ["mp3", "wav"] and not ffmpeg.exists():
+                    return {
+                        "status": False,
+                        "message": "ffmpeg.exe not found (required for audio conversion)",
+                        "filepath": None,
+                    }
+
+                staging_dir = await asyncio.to_thread(
+                    self._sync._create_staging_dir
+                )
+                source = await asyncio.to_thread(
+                    self._sync._download_source, staging_dir, url, info
+                )
+                args = self._sync._download_args(
+                    source, staging_dir, format_string, settings, ffmpeg
+                )
+                cmd = self._sync._subprocess_download_cmd(yt_dlp, args)
+                process = await self._spawn(cmd)
+
+                output = DownloadOutput()
+
+                async def pump(name, stream):
+                    async for raw in stream:
+                        event = output.feed(name, raw.decode("utf-8", "replace"))
+                        if event is not None:
+                            emit(event)
+
+                await asyncio.gather(
+                    pump("stdout", process.stdout), pump("stderr", process.stderr)
+                )
+                await process.wait()
+
+                result = download_result(
+                    process.returncode, output.filepath, output.error_output
+                )
+                if result["status"]:
+                    key = output.archive_key or await asyncio.to_thread(
+                        self._sync.archive_key, url, info
+                    )
+                    await asyncio.to_thread(
+                        self._sync._record_download, key, output.filepath, url
+                    )
+                    emit({"status": "finished", "filename": output.filepath})
+                return result
+            except Exception as e:
+                return {
+                    "status": False,
+                    "message": f"Download failed: {e}",
+                    "filepath": None,
+                }
+            finally:
+                if process is not None:
+                    await asyncio.shield(self._kill(process))
+                if staging_dir:
+                    await asyncio.shield(
+                        asyncio.to_thread(remove_staging_dir, staging_dir)
+                    )
@@ -0,0 +1,148 @@
+import threading
+import time
+
+
+# Restart a yt-dlp child for a new share only if it moved by more than
+# this fraction, and only if it pays off: for a lower share, the jobs
+# together must run more than this fraction over the budget; for a higher
+# one, they must leave more than this fraction of it unused while the
+# child runs at its old cap (CAPPED_FRACTION of it or more) and has run
+# RESTART_INTERVAL seconds. A restart costs a new yt-dlp process, so
+# shares that change as jobs come and go mostly wait for the next restart.
+REBALANCE_THRESHOLD = 0.25
+CAPPED_FRACTION = 0.8
+RESTART_INTERVAL = 10.0
+
+# A job's reported speed counts towards the aggregate rate for this long;
+# yt-dlp reports nothing while it sleeps to honour a lowered limit
+SPEED_STALE_AFTER = 3.0
+
+
+def parse_rate(value):
+    """Turn 5000000, "5M" or "800K" into bytes per second (None stays None)."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = str(value).strip().upper().rstrip("/S").rstrip("B").rstrip("I")
+    multipliers = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    if text and text[-1] in multipliers:
+        return float(text[:-1]) * multipliers[text[-1]]
+    return float(text)
+
+
+class BandwidthLease:
+    """One active download's share of a BandwidthGovernor's budget."""
+
+    def __init__(self, governor):
+        self._governor = governor
+        self.rate = None  # bytes per second assigned right now
+        self.applied_rate = None  # rate the running download was started with
+        self.applied_at = 0.0
+        self.speed = 0.0  # last reported download speed
+        self.reported_at = 0.0
+        self.on_change = None  # called with the new rate, from any thread
+
+    def apply(self):
+        """Record that the download now runs with the current rate."""
+        self.applied_rate = self.rate
+        self.applied_at = time.monotonic()
+        return self.rate
+
+    def needs_restart(self):
+        """Whether a child started with ``applied_rate`` should be restarted
+        with its current share (see REBALANCE_THRESHOLD)."""
+        if self.rate is None or self.applied_rate is None:
+            return False
+        change = abs(self.rate - self.applied_rate) / self.applied_rate
+        if change <= REBALANCE_THRESHOLD:
+            return False
+        if self.rate > self.applied_rate:
+            if time.monotonic() - self.applied_at < RESTART_INTERVAL:
+                return False
+        return self._governor.claim_restart(self)
+
+    def report(self, speed):
+        self.speed = speed or 0.0
+        self.reported_at = time.monotonic()
+
+    def current_speed(self):
+        if time.monotonic() - self.reported_at > SPEED_STALE_AFTER:
+            return 0.0
+        return self.speed
+
+    def release(self):
+        self._governor.release(self)
+
+
+class BandwidthGovernor:
+    """Split a global download budget evenly between the active jobs.
+
+    Every download takes a lease while it runs; whenever one starts or
+    finishes the shares are recomputed. In-process downloads pick up a new
+    share immediately. yt-dlp children get theirs as ``--limit-rate``; they
+    are restarted (resuming their .part files) only when the jobs together
+    overrun the budget or leave much of it unused (``claim_restart``).
+    """
+
+    def __init__(self, limit):
+        self.limit = parse_rate(limit)
+        self._lock = threading.Lock()
+        self._leases = []
+
+    def acquire(self):
+        lease = BandwidthLease(self)
+        with self._lock:
+            self._leases.append(lease)
+            changed = self._rebalance()
+        self._notify(changed)
+        return lease
+
+    def release(self, lease):
+        with self._lock:
+            if lease not in self._leases:
+                return
+            self._leases.remove(lease)
+            changed = self._rebalance()
+        self._notify(changed)
+
+    def _rebalance(self):
+        if not self._leases:
+            return []
+        share = self.limit / len(self._leases)
+        changed = [lease for lease in self._leases if lease.rate != share]
+        for lease in changed:
+            lease.rate = share
+        return changed
+
+    def claim_restart(self, lease):
+        """Whether restarting ``lease``'s child with its new share is worth it.
+
+        A granted restart counts the child as stopped right away, so jobs
+        checking at the same time restart only as many as needed.
+        """
+        with self._lock:
+            rate = sum(other.current_speed() for other in self._leases)
+            if lease.rate < lease.applied_rate:
+                worth = rate > self.limit * (1 + REBALANCE_THRESHOLD)
+            else:
+                capped = lease.current_speed() >= lease.applied_rate * CAPPED_FRACTION
+                worth = capped and rate < self.limit * (1 - REBALANCE_THRESHOLD)
+            if worth:
+                lease.speed = 0.0
+            return worth
+
+    def _notify(self, leases):
+        for lease in leases:
+            if lease.on_change:
+                lease.on_change(lease.rate)
+
+    def stats(self):
+        """Return the budget, active job count, per-job share and the
+        achieved aggregate rate (sum of the jobs' last reported speeds)."""
+        with self._lock:
+            active = len(self._leases)
+            return {
+                "limit": self.limit,
+                "active": active,
+                "share": self.limit / active if active else self.limit,
+                "rate": sum(lease.current_speed() for lease in self._leases),
+            }
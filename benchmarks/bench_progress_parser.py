@@ -0,0 +1,135 @@
+"""Compare the old split-based progress scraping with ProgressParser.
+
+ProgressParser splits the delimited download lines yt-dlp prints for
+PROGRESS_TEMPLATES with one precompiled regex into a reused record, so it
+also yields speed, ETA and fragment data the old loop never had. Three
+numbers are reported per line:
+
+- parse: ProgressParser plus reading the fields download_video uses on
+  every line (status, bytes, speed, file name);
+- throttled: that plus a ProgressThrottle at the default rate, which is
+  what download_video does; the hook dict is only built for delivered
+  updates;
+- every line: a hook dict built for every line, as with progress_rate=0.
+
+Run from the repository root: python benchmarks/bench_progress_parser.py
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from progress_parser import ProgressParser  # noqa: E402
+from progress_throttle import ProgressThrottle  # noqa: E402
+
+
+# Output of the old default progress format and of PROGRESS_TEMPLATES for the
+# same download, mixed with the non-progress lines yt-dlp prints around it.
+LEGACY_LINES = [
+    "[youtube] Extracting URL: https://www.youtube.com/watch?v=dQw4w9WgXcQ\n",
+    "[info] dQw4w9WgXcQ: Downloading 1 format(s): 137+140\n",
+    "[download] Destination: Rick Astley.f137.mp4\n",
+] + [
+    f"[download]  {p:4.1f}% of  120.50MiB at    3.21MiB/s ETA 00:{59 - p % 60:02d}\n"
+    for p in range(0, 100)
+] + ["[Merger] Merging formats into \"Rick Astley.mp4\"\n"]
+
+TEMPLATE_LINES = LEGACY_LINES[:3] + [
+    f"[progress] downloading|{p * 1263534}|126353408|NA|3365928.96|{59 - p % 60}"
+    f'|{p / 10}|NA|NA|dQw4w9WgXcQ|"Rick Astley.f137.mp4"'
+    '|"Rick Astley.f137.mp4.part"|"Rick Astley"\n'
+    for p in range(0, 100)
+] + LEGACY_LINES[-1:]
+
+
+def legacy_parse_size(size_str):
+    try:
+        size_str = size_str.strip()
+        if "GiB" in size_str:
+            return float(size_str.replace("GiB", "")) * 1024 * 1024 * 1024
+        elif "MiB" in size_str:
+            return float(size_str.replace("MiB", "")) * 1024 * 1024
+        elif "KiB" in size_str:
+            return float(size_str.replace("KiB", "")) * 1024
+        return 0
+    except:
+        return 0
+
+
+def legacy_loop(lines, hook):
+    for line in lines:
+        progress_data = {
+            "status": "downloading",
+            "percent": 0,
+            "speed": 0,
+            "downloaded": 0,
+            "total": 0,
+            "filename": None,
+        }
+        if "[download]" in line and "%" in line:
+            parts = line.split()
+            for i, part in enumerate(parts):
+                if "%" in part:
+                    try:
+                        progress_data["percent"] = int(float(part.strip("%")))
+                    except:
+                        pass
+                if "MiB" in part or "KiB" in part or "GiB" in part:
+                    try:
+                        if i > 0 and "of" in parts[i - 1]:
+                            size_parts = parts[i - 2 : i + 1]
+                            progress_data["downloaded"] = legacy_parse_size(
+                                size_parts[0]
+                            )
+                            progress_data["total"] = legacy_parse_size(size_parts[2])
+                    except:
+                        pass
+        if "[download] Destination:" in line:
+            progress_data["filename"] = line.split("Destination:")[-1].strip()
+        if "[ExtractAudio]" in line or "[ffmpeg]" in line:
+            progress_data["status"] = "converting"
+        hook(progress_data)
+
+
+def parser_loop(lines, hook):
+    parser = ProgressParser()
+    for line in lines:
+        event = parser.parse(line)
+        if event is not None:
+            # What DownloadOutput, the stall watchdog and the lease read
+            event.status, event.downloaded_bytes, event.speed, event.filename
+            hook(event)
+
+
+def per_line(function, lines, number, repeat):
+    seconds = min(
+        timeit.repeat(lambda: function(lines), number=number, repeat=repeat)
+    )
+    return seconds / (len(lines) * number) * 1e6
+
+
+def main(number=300, repeat=7):
+    discard = lambda d: None
+    throttle = ProgressThrottle(discard)
+    results = [
+        ("legacy split parser", LEGACY_LINES, lambda ls: legacy_loop(ls, discard)),
+        ("ProgressParser parse", TEMPLATE_LINES, lambda ls: parser_loop(ls, discard)),
+        ("  + throttled hook", TEMPLATE_LINES, lambda ls: parser_loop(ls, throttle)),
+        (
+            "  + dict every line",
+            TEMPLATE_LINES,
+            lambda ls: parser_loop(ls, lambda e: e.as_dict()),
+        ),
+    ]
+    legacy = None
+    for name, lines, function in results:
+        us = per_line(function, lines, number, repeat)
+        legacy = legacy or us
+        print(f"{name:<22}: {us:6.2f} us/line  ({legacy / us:4.2f}x)")
+    throttle.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def archive_key(extractor, video_id):
+    """Return the yt-dlp ``--download-archive`` line for a video."""
+    if not extractor or not video_id:
+        return None
+    return f"{extractor.lower()} {video_id}"
+
+
+def archive_key_for_info(info):
+    return archive_key(
+        info.get("extractor_key") or info.get("extractor"), info.get("id")
+    )
+
+
+class DownloadArchive:
+    """Persistent, indexed record of finished downloads.
+
+    Keys are yt-dlp download-archive lines ("<extractor> <id>", e.g.
+    "youtube dQw4w9WgXcQ"), so existing ``--download-archive`` files can be
+    imported and the index exported back to one. Lookups hit the SQLite
+    primary key, so they stay fast with millions of entries. The URLs a
+    video was downloaded from are kept as aliases, so sites whose IDs
+    cannot be read from the URL are recognised without running yt-dlp.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS archive ("
+                "key TEXT PRIMARY KEY, filepath TEXT, added REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS aliases (url TEXT PRIMARY KEY, key TEXT NOT NULL)"
+            )
+
+    def _connect(self):
+        # Short-lived connections, as in MetadataCache, for use from any thread
+        return sqlite3.connect(self.path, timeout=10)
+
+    def resolve(self, url):
+        """Return the key recorded for a URL a video was downloaded from."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT key FROM aliases WHERE url = ?", (url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get(self, key):
+        """Return ``{"key", "filepath", "added"}`` for ``key``, or None."""
+        if not key:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT key, filepath, added FROM archive WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"key": row[0], "filepath": row[1], "added": row[2]}
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM archive").fetchone()[0]
+
+    def add(self, key, filepath=None, aliases=()):
+        if not key:
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO archive (key, filepath, added) "
+                "VALUES (?, ?, ?)",
+                (key, str(filepath) if filepath else None, time.time()),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO aliases (url, key) VALUES (?, ?)",
+                [(url, key) for url in aliases if url],
+            )
+
+    def remove(self, key):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM archive WHERE key = ?", (key,))
+            conn.execute("DELETE FROM aliases WHERE key = ?", (key,))
+
+    def import_file(self, path):
+        """Add every line of a yt-dlp ``--download-archive`` file.
+
+        Existing entries keep their recorded file path. Returns the number
+        of lines read.
+        """
+        now = time.time()
+        count = 0
+        with open(path, encoding="utf-8") as f, self._lock, self._connect() as conn:
+            batch = []
+            for line in f:
+                key = line.strip()
+                if not key:
+                    continue
+                batch.append((key, now))
+                count += 1
+                if len(batch) >= 10000:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO archive (key, added) VALUES (?, ?)",
+                        batch,
+                    )
+                    batch = []
+            conn.executemany(
+                "INSERT OR IGNORE INTO archive (key, added) VALUES (?, ?)", batch
+            )
+        return count
+
+    def export_file(self, path):
+        """Write all keys as a yt-dlp ``--download-archive`` file."""
+        count = 0
+        with self._connect() as conn, open(path, "w", encoding="utf-8") as f:
+            for (key,) in conn.execute("SELECT key FROM archive ORDER BY added"):
+                f.write(key + "\n")
+                count += 1
+        return count
@@ -1,9 +1,32 @@
+import contextlib
+import io
+import logging
 import os
-import requests
-import patoolib
 import shutil
+import subprocess
+import sys
+import tarfile
 import tempfile
-from rich.progress import Progress
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import curl_cffi
+import patoolib
+from rich.progress import (
+    Progress,
+    BarColumn,
+    DownloadColumn,
+    TransferSpeedColumn,
+    TimeRemainingColumn,
+    TextColumn,
+    FileSizeColumn,
+)
+
+import http_client
+from process_control import hidden_startupinfo
 
 
 def ffmpeg_dir_path():
@@ -20,62 +43,376 @@ def is_ffmpeg_ready():
     return all(os.path.isfile(f) for f in ffmpeg_required_files())
 
 
-from rich.progress import (
-    Progress,
-    BarColumn,
-    DownloadColumn,
-    TransferSpeedColumn,
-    TimeRemainingColumn,
-    TextColumn,
-    FileSizeColumn,
-)
+# Parallel connections for a download whose server accepts byte ranges
+DOWNLOAD_SEGMENTS = 4
+# Segments are never smaller than this; small files use fewer connections
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+# Attempts per segment; each one resumes where the previous stopped
+SEGMENT_ATTEMPTS = 5
+# Received data is written in blocks of this size
+WRITE_BLOCK_SIZE = 256 * 1024
+# Seconds between progress bar updates
+PROGRESS_INTERVAL = 0.25
 
 
-import time
+class _Segment:
+    """Byte range ``start``-``end`` (inclusive; ``end`` None if unknown) of
+    the destination file, of which ``done`` bytes have been written."""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.done = 0
+
+    @property
+    def complete(self):
+        return self.end is not None and self.start + self.done > self.end
+
 
+def _probe(url):
+    """Return the size of ``url`` (or None), whether the server accepts byte
+    ranges, and the ETag/Last-Modified that ties ranges to one version.
 
-def download_with_progress(url, dest):
+    A one-byte range request answers all three, also from servers that
+    do not implement HEAD or omit Accept-Ranges.
+    """
+    response = http_client.get(url, headers={"Range": "bytes=0-0"}, stream=True)
+    response.close()
+    validator = response.headers.get("etag") or response.headers.get(
+        "last-modified"
+    )
+    if response.status_code == 206:
+        total = response.headers.get("content-range", "").rpartition("/")[2]
+        if total.isdigit():
+            return int(total), True, validator
+    elif response.status_code == 200:
+        size = int(response.headers.get("content-length") or 0) or None
+        return size, False, validator
+    return None, False, validator
+
+
+if hasattr(os, "pwrite"):
+
+    def _write_at(fd, data, offset, lock):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+
+else:
+    # No pwrite on Windows: seek and write under a lock shared by the threads
+    def _write_at(fd, data, offset, lock):
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+
+
+def _download_segment(url, fd, segment, validator, ranged, lock, stop):
+    """Fetch one segment into ``fd``, resuming it after connection errors."""
+
+    def write(block):
+        _write_at(fd, block, segment.start + segment.done, lock)
+        segment.done += len(block)
+
+    for attempt in range(1, SEGMENT_ATTEMPTS + 1):
+        if stop.is_set():
+            return
+        headers = {}
+        if ranged:
+            end = "" if segment.end is None else segment.end
+            headers["Range"] = f"bytes={segment.start + segment.done}-{end}"
+            if validator:
+                headers["If-Range"] = validator
+        else:
+            # Without range support a retry starts over
+            segment.done = 0
+        try:
+            response = http_client.get(url, headers=headers, stream=True)
+            try:
+                if response.status_code != (206 if ranged else 200):
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                http_client.write_stream(response, write, WRITE_BLOCK_SIZE, stop)
+            finally:
+                response.close()
+            if stop.is_set():
+                return
+            if segment.end is None or segment.complete:
+                return
+            raise ConnectionError("Segment ended early")
+        except (curl_cffi.CurlError, ConnectionError):
+            if attempt == SEGMENT_ATTEMPTS or stop.is_set():
+                raise
+            time.sleep(attempt)
+
+
+def download_with_progress(url, dest, segments=DOWNLOAD_SEGMENTS):
+    """Download ``url`` to ``dest``, over several connections if possible.
+
+    When the server reports the size and accepts byte ranges, the file is
+    preallocated and split into up to ``segments`` ranges that are fetched
+    in parallel and written in place; a segment whose connection drops is
+    resumed from where it stopped. Otherwise a single stream is used. The
+    progress bar is refreshed on a timer rather than per chunk.
+    """
+    size, ranged, validator = _probe(url)
+    if size and ranged:
+        count = max(1, min(segments, size // MIN_SEGMENT_SIZE))
+        bounds = [size * i // count for i in range(count + 1)]
+        parts = [_Segment(bounds[i], bounds[i + 1] - 1) for i in range(count)]
+    else:
+        ranged = False
+        parts = [_Segment(0, size - 1 if size else None)]
+
+    with open(dest, "wb") as f:
+        if size:
+            f.truncate(size)
+    fd = os.open(dest, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    lock = threading.Lock()
+    stop = threading.Event()
+    try:
+        with (
+            Progress(
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                DownloadColumn(),
+                FileSizeColumn(),
+                TextColumn("{task.fields[avg_speed]}"),
+                TimeRemainingColumn(),
+            ) as progress,
+            ThreadPoolExecutor(max_workers=len(parts)) as pool,
+        ):
+            task = progress.add_task(
+                f"{os.path.basename(dest)}", total=size, avg_speed="0 MB/s"
+            )
+            start_time = time.time()
+            futures = [
+                pool.submit(
+                    _download_segment, url, fd, part, validator, ranged, lock, stop
+                )
+                for part in parts
+            ]
+            try:
+                pending = futures
+                while pending:
+                    _, pending = wait(pending, timeout=PROGRESS_INTERVAL)
+                    downloaded = sum(part.done for part in parts)
+                    elapsed = time.time() - start_time
+                    avg_speed = (
+                        f"{downloaded / 1024 / 1024 / elapsed:.2f} MB/s"
+                        if elapsed > 0
+                        else "0 MB/s"
+                    )
+                    progress.update(task, completed=downloaded, avg_speed=avg_speed)
+                    for future in futures:
+                        if future.done() and future.exception():
+                            # Stop the others now rather than after they finish
+                            stop.set()
+                            future.result()
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # Let the other segments stop at their next chunk
+                stop.set()
+                raise
+    finally:
+        os.close(fd)
+
+    if not size:
+        # Unknown size: the single stream wrote the whole file
+        return
+    if sum(part.done for part in parts) != size:
+        raise RuntimeError("Download incomplete")
+
+
+FFMPEG_URL = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-git-essentials.7z"
+# Programs in the archive's bin/ that the app never runs; never extracted
+SKIPPED_BINARIES = ("ffplay", "ffprobe")
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def archive_kind(name):
+    """Return "7z", "zip" or "tar" for an archive file name or URL path."""
+    name = name.lower()
+    if name.endswith(".7z"):
+        return "7z"
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar", ".tar.gz", ".tgz", ".tar.xz", ".txz", ".tar.bz2")):
+        return "tar"
+    return None
+
+
+def is_wanted_member(name):
+    """Whether an archive member is a file of the build's bin/ to keep."""
+    parts = name.replace("\\", "/").rstrip("/").split("/")
+    if len(parts) < 2 or parts[-2] != "bin":
+        return False
+    return os.path.splitext(parts[-1])[0].lower() not in SKIPPED_BINARIES
+
+
+def _prepare_target(target_dir):
+    # Clean and ensure the final target directory exists
+    if os.path.exists(target_dir):
+        print(f"Cleaning existing target directory: {target_dir}")
+        shutil.rmtree(target_dir)
+    os.makedirs(target_dir)
+
+
+def _write_member(src, target_dir, name):
+    # Members land flat in target_dir; only their base name is used
+    with open(os.path.join(target_dir, os.path.basename(name)), "wb") as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+
+def extract_zip(archive, target_dir):
+    """Extract only the wanted bin/ members of a zip into ``target_dir``."""
+    with zipfile.ZipFile(archive) as zf:
+        members = [
+            info
+            for info in zf.infolist()
+            if not info.is_dir() and is_wanted_member(info.filename)
+        ]
+        if not members:
+            raise RuntimeError(f"Could not find 'bin' directory within {archive}")
+        _prepare_target(target_dir)
+        for info in members:
+            with zf.open(info) as src:
+                _write_member(src, target_dir, info.filename)
+
+
+def find_7z():
+    """Return the path of a 7-Zip command line program, or None."""
+    for name in ("7z", "7zz", "7za"):
+        path = shutil.which(name)
+        if path:
+            return path
+    if sys.platform == "win32":
+        for base in (os.environ.get("ProgramFiles"), os.environ.get("ProgramW6432")):
+            if base and os.path.isfile(os.path.join(base, "7-Zip", "7z.exe")):
+                return os.path.join(base, "7-Zip", "7z.exe")
+    return None
+
+
+def extract_7z(archive, target_dir):
+    """Extract only the wanted bin/ members of a 7z into ``target_dir``.
+
+    The 7z program lists the archive and then decompresses just those
+    members, flat, straight into the target. Without it, patool extracts
+    the whole archive (see ``extract_and_move``).
+    """
+    seven_zip = find_7z()
+    if seven_zip is None:
+        extract_and_move(archive, target_dir)
+        return
+
+    listing = subprocess.run(
+        [seven_zip, "l", "-slt", archive],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        check=True,
+        startupinfo=hidden_startupinfo(),
+    ).stdout
+    # Entries follow the "----------" line as "Key = value" blocks
+    members = []
+    entry = {}
+    for line in listing.partition("----------")[2].splitlines() + [""]:
+        key, sep, value = line.partition(" = ")
+        if sep:
+            entry[key.strip()] = value
+        elif entry:
+            if entry.get("Folder") != "+" and is_wanted_member(entry.get("Path", "")):
+                members.append(entry["Path"])
+            entry = {}
+    if not members:
+        raise RuntimeError(f"Could not find 'bin' directory within {archive}")
+
+    _prepare_target(target_dir)
+    subprocess.run(
+        [seven_zip, "e", archive, f"-o{target_dir}", "-y", "-bso0", "-bsp0", *members],
+        capture_output=True,
+        check=True,
+        startupinfo=hidden_startupinfo(),
+    )
+
+
+class _ResponseReader(io.RawIOBase):
+    """Readable file object over a streamed curl_cffi response."""
+
+    def __init__(self, response, on_read=None):
+        self._chunks = response.iter_content()
+        self._pending = b""
+        self._on_read = on_read
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b""
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        if self._on_read:
+            self._on_read(size)
+        return size
+
+
+def stream_extract_tar(url, target_dir):
+    """Extract the wanted bin/ members of a tar archive while downloading it.
+
+    The archive is read sequentially from the response (any compression
+    tarfile supports), so it never touches the disk.
+    """
     with (
-        requests.get(url, stream=True) as r,
+        contextlib.closing(http_client.get(url, stream=True)) as response,
         Progress(
             TextColumn("[progress.description]{task.description}"),
             BarColumn(),
             DownloadColumn(),
-            FileSizeColumn(),
-            TextColumn("{task.fields[avg_speed]}"),
             TimeRemainingColumn(),
         ) as progress,
     ):
-        r.raise_for_status()
-        total = int(r.headers.get("content-length", 0))
-        task = progress.add_task(
-            f"{os.path.basename(dest)}", total=total, avg_speed="0 MB/s"
-        )
-        start_time = time.time()
-        downloaded = 0
-        with open(dest, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    elapsed = time.time() - start_time
-                    avg_speed = (
-                        f"{downloaded / 1024 / 1024 / elapsed:.2f} MB/s"
-                        if elapsed > 0
-                        else "0 MB/s"
-                    )
-                    progress.update(task, advance=len(chunk), avg_speed=avg_speed)
-
-
-import contextlib
-
-
-import logging
+        response.raise_for_status()
+        total = int(response.headers.get("content-length") or 0) or None
+        task = progress.add_task(os.path.basename(urlparse(url).path), total=total)
+        received = [0, time.monotonic()]
+
+        def on_read(size):
+            received[0] += size
+            now = time.monotonic()
+            if now - received[1] >= PROGRESS_INTERVAL:
+                received[1] = now
+                progress.update(task, completed=received[0])
+
+        reader = io.BufferedReader(_ResponseReader(response, on_read), COPY_BUFFER_SIZE)
+        found = False
+        with tarfile.open(fileobj=reader, mode="r|*") as tar:
+            for member in tar:
+                if not member.isfile() or not is_wanted_member(member.name):
+                    continue
+                if not found:
+                    _prepare_target(target_dir)
+                    found = True
+                _write_member(tar.extractfile(member), target_dir, member.name)
+        progress.update(task, completed=received[0])
+        if not found:
+            raise RuntimeError(f"Could not find 'bin' directory within {url}")
 
 
 def extract_and_move(archive, target_dir):
-    # target_dir is the main 'ffmpeg' folder
-    with tempfile.TemporaryDirectory() as tmpdir:
+    # target_dir is the main 'ffmpeg' folder. Fallback for archives only
+    # patool can read: everything is extracted next to it, then only the
+    # wanted files are moved (a rename on the same filesystem).
+    parent_dir = os.path.dirname(os.path.abspath(target_dir))
+    with tempfile.TemporaryDirectory(dir=parent_dir) as tmpdir:
         # Suppress patoolib output
         with (
             open(os.devnull, "w") as devnull,
@@ -100,18 +437,16 @@ def extract_and_move(archive, target_dir):
                 f"Could not find 'bin' directory within {extracted_root_dir}"
             )
 
-        # Clean and ensure the final target directory exists
-        if os.path.exists(target_dir):
-            print(f"Cleaning existing target directory: {target_dir}")
-            shutil.rmtree(target_dir)
-        os.makedirs(target_dir)
+        _prepare_target(target_dir)
 
-        # Move all files from extracted 'bin' to the target directory
+        # Move the wanted files from extracted 'bin' to the target directory
         print(f"Moving files from extracted 'bin' to {target_dir}")
         for item_name in os.listdir(src_bin_dir):
             src_item_path = os.path.join(src_bin_dir, item_name)
             dst_item_path = os.path.join(target_dir, item_name)
-            if os.path.isfile(src_item_path):
+            if os.path.isfile(src_item_path) and is_wanted_member(
+                f"bin/{item_name}"
+            ):
                 shutil.move(src_item_path, dst_item_path)
             # We ignore any subdirectories within bin, if they exist
 
@@ -119,15 +454,17 @@ def extract_and_move(archive, target_dir):
         # will be deleted automatically.
 
 
-def download_and_extract_ffmpeg():
+EXTRACTORS = {"7z": extract_7z, "zip": extract_zip}
+
+
+def download_and_extract_ffmpeg(url=FFMPEG_URL):
     """
-    Downloads and extracts ffmpeg if not already present. Removes ffplay and ffprobe.
-    Returns the absolute ffmpeg directory path.
+    Downloads and extracts ffmpeg if not already present. ffplay and ffprobe
+    are skipped. Returns the absolute ffmpeg directory path.
     """
-    url = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-git-essentials.7z"
-    # Use a temporary filename for download to avoid conflict if script interrupted
-    temp_archive = "ffmpeg-download.tmp.7z"
     target_dir = ffmpeg_dir_path()
+    kind = archive_kind(urlparse(url).path)
+    temp_archive = None
 
     if is_ffmpeg_ready():
         print("FFmpeg already present.")
@@ -135,22 +472,22 @@ def download_and_extract_ffmpeg():
 
     print("FFmpeg not found or incomplete. Downloading...")
     try:
-        download_with_progress(url, temp_archive)
-        print("Download complete. Extracting...")
-        extract_and_move(temp_archive, target_dir)
-        print("Extraction complete. Cleaning up executables...")
-
-        # Delete ffplay.exe and ffprobe.exe from the target directory
-        for exe_to_delete in ("ffplay.exe", "ffprobe.exe"):
-            file_path = os.path.join(
-                target_dir, exe_to_delete
-            )  # Check in target_dir directly
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    print(f"Removed {exe_to_delete}")
-            except OSError as e:
-                print(f"Warning: Could not remove {file_path}: {e}")
+        if kind == "tar":
+            stream_extract_tar(url, target_dir)
+        else:
+            # Download next to the target directory (not into the CWD) under
+            # a unique name, so an interrupted run cannot conflict
+            suffix = os.path.splitext(urlparse(url).path)[1]
+            fd, temp_archive = tempfile.mkstemp(
+                prefix="ffmpeg-download-",
+                suffix=suffix,
+                dir=os.path.dirname(target_dir),
+            )
+            os.close(fd)
+            download_with_progress(url, temp_archive)
+            print("Download complete. Extracting...")
+            EXTRACTORS.get(kind, extract_and_move)(temp_archive, target_dir)
+        print("Extraction complete.")
 
     except Exception as e:
         print(f"Error during download/extraction: {e}")
@@ -166,7 +503,7 @@ def download_and_extract_ffmpeg():
         return None  # Indicate failure
     finally:
         # Ensure temporary archive is always removed
-        if os.path.exists(temp_archive):
+        if temp_archive and os.path.exists(temp_archive):
             try:
                 os.remove(temp_archive)
                 print(f"Removed temporary archive: {temp_archive}")
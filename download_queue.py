@@ -0,0 +1,301 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bandwidth_governor import BandwidthGovernor
+from downloader import DEFAULT_BACKEND, YTVideoDownloader
+from performance import DEFAULT_PROFILE
+from process_control import DownloadJob
+from progress_throttle import DEFAULT_PROGRESS_RATE
+from ytdlp_worker import get_worker_pool
+
+
+class PlaylistFeed:
+    """Handle of a playlist or channel being fed into a DownloadQueue.
+
+    ``job_ids`` grows as entries are listed; ``errors`` collects listing
+    errors (e.g. unavailable entries). ``cancel()`` stops the listing and
+    cancels the jobs it queued.
+    """
+
+    def __init__(self, queue, url):
+        self.url = url
+        self.job_ids = []
+        self.errors = []
+        self._queue = queue
+        self._stopped = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._stopped.is_set()
+
+    def cancel(self):
+        self._stopped.set()
+        for job_id in list(self.job_ids):
+            self._queue.cancel(job_id)
+
+    def done(self):
+        """Whether the listing has finished (its jobs may still be running)."""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the listing has finished; return whether it has."""
+        return self._done.wait(timeout)
+
+    def results(self):
+        """Block until every listed entry has been downloaded and return
+        ``{job_id: result}`` in playlist order."""
+        self._done.wait()
+        return {job_id: self._queue.result(job_id) for job_id in self.job_ids}
+
+
+class DownloadQueue:
+    """Run many download jobs with at most ``max_concurrent`` yt-dlp processes.
+
+    Progress dicts are passed to ``progress_hook`` exactly as
+    ``YTVideoDownloader.download_video`` produces them, with ``job_id`` and
+    ``url`` added so callers can tell jobs apart. Hooks are called from the
+    worker threads, so they must be thread-safe. Each job's updates are
+    coalesced to ``progress_rate`` calls per second. ``add_playlist`` feeds
+    a playlist or channel in as it is listed. ``bandwidth_limit``
+    (bytes per second, or e.g. "5M") caps the combined speed of all jobs.
+    Videos already in the download archive finish at once with
+    ``"skipped": True`` unless added with ``force=True``.
+    """
+
+    def __init__(
+        self,
+        max_concurrent=3,
+        progress_hook=None,
+        finished_hook=None,
+        browsers=None,
+        download_dir=None,
+        progress_rate=DEFAULT_PROGRESS_RATE,
+        performance=DEFAULT_PROFILE,
+        backend=DEFAULT_BACKEND,
+        bandwidth_limit=None,
+        use_archive=True,
+    ):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.progress_hook = progress_hook
+        self.finished_hook = finished_hook
+        self.browsers = browsers if browsers else []
+        self.download_dir = download_dir
+        self.progress_rate = progress_rate
+        self.performance = performance
+        self.backend = backend
+        self.use_archive = use_archive
+        self.bandwidth = (
+            BandwidthGovernor(bandwidth_limit) if bandwidth_limit else None
+        )
+
+        if backend in ("auto", "pool"):
+            # A worker per running job, and one for a playlist listing; jobs
+            # only use the pool in "auto" mode without bin/yt-dlp.exe
+            get_worker_pool(size=self.max_concurrent + 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent, thread_name_prefix="yt-dlp-job"
+        )
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Notified whenever a job starts or finishes, for playlist feeds
+        # waiting on room
+        self._job_finished = threading.Condition(self._lock)
+        self._feeds = []
+        self._futures = {}
+        # Jobs submitted but not started yet, for the playlist feed backlog
+        self._queued = 0
+        self._jobs = {}
+        self._results = {}
+
+    def add(self, url, format_string=None, performance=None, force=False):
+        """Queue a download and return its job id.
+
+        ``performance`` overrides the queue's performance profile for this job.
+        """
+        job_id = next(self._ids)
+        job = DownloadJob()
+        with self._lock:
+            self._jobs[job_id] = job
+            self._queued += 1
+            self._futures[job_id] = self._executor.submit(
+                self._run_job, job_id, url, format_string, performance, job, force
+            )
+        return job_id
+
+    def add_many(self, urls, format_string=None, performance=None, force=False):
+        return [
+            self.add(
+                url, format_string=format_string, performance=performance, force=force
+            )
+            for url in urls
+        ]
+
+    def add_playlist(
+        self, url, format_string=None, performance=None, force=False, backlog=None
+    ):
+        """Queue every entry of a playlist or channel and return a PlaylistFeed.
+
+        The entries are listed lazily with ``--flat-playlist`` in a background
+        thread and queued one by one; each job then extracts its own video
+        just in time. The listing runs at most ``backlog`` (default: twice
+        ``max_concurrent``) jobs ahead of the downloads, so a channel of
+        thousands of videos is never held in memory at once.
+        """
+        feed = PlaylistFeed(self, url)
+        if backlog is None:
+            backlog = self.max_concurrent * 2
+        with self._lock:
+            self._feeds.append(feed)
+        threading.Thread(
+            target=self._run_feed,
+            args=(feed, format_string, performance, force, max(1, backlog)),
+            name="yt-dlp-playlist",
+            daemon=True,
+        ).start()
+        return feed
+
+    def _run_feed(self, feed, format_string, performance, force, backlog):
+        downloader = YTVideoDownloader(
+            use_rich=False,
+            browsers=self.browsers,
+            download_dir=self.download_dir,
+            backend=self.backend,
+        )
+        entries = downloader.iter_playlist(feed.url)
+        try:
+            for item in entries:
+                if feed.cancelled:
+                    break
+                if not item["status"] or not item["url"]:
+                    feed.errors.append(item.get("message", "Entry has no URL"))
+                    continue
+                # Leaves yt-dlp blocked on its output pipe (or, in-process,
+                # the next page unfetched) until there is room
+                with self._lock:
+                    while self._queued >= backlog and not feed.cancelled:
+                        self._job_finished.wait(0.5)
+                if feed.cancelled:
+                    break
+                feed.job_ids.append(
+                    self.add(
+                        item["url"],
+                        format_string=format_string,
+                        performance=performance,
+                        force=force,
+                    )
+                )
+        finally:
+            entries.close()
+            with self._lock:
+                if feed in self._feeds:
+                    self._feeds.remove(feed)
+            feed._done.set()
+
+    def _run_job(self, job_id, url, format_string, performance, job, force=False):
+        with self._lock:
+            self._queued -= 1
+            self._job_finished.notify_all()
+
+        def job_hook(d):
+            d["job_id"] = job_id
+            d["url"] = url
+            self.progress_hook(d)
+
+        try:
+            downloader = YTVideoDownloader(
+                progress_hook=job_hook if self.progress_hook else None,
+                use_rich=False,
+                browsers=self.browsers,
+                download_dir=self.download_dir,
+                progress_rate=self.progress_rate,
+                performance=self.performance,
+                backend=self.backend,
+                bandwidth=self.bandwidth,
+                use_archive=self.use_archive,
+            )
+            result = downloader.download_video(
+                url,
+                format_string=format_string,
+                performance=performance,
+                job=job,
+                force=force,
+            )
+        except Exception as e:
+            result = {"status": False, "message": str(e), "filepath": None}
+
+        result["job_id"] = job_id
+        result["url"] = url
+        with self._lock:
+            self._results[job_id] = result
+            self._jobs.pop(job_id, None)
+            self._job_finished.notify_all()
+
+        if self.finished_hook:
+            try:
+                self.finished_hook(job_id, result)
+            except Exception:
+                pass
+        return result
+
+    def job(self, job_id):
+        """Return the DownloadJob handle of a queued or running job, if any."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job; a running one has its yt-dlp process tree killed."""
+        job = self.job(job_id)
+        return job.cancel() if job else False
+
+    def pause(self, job_id):
+        job = self.job(job_id)
+        return job.pause() if job else False
+
+    def resume(self, job_id):
+        job = self.job(job_id)
+        return job.resume() if job else False
+
+    def cancel_all(self):
+        with self._lock:
+            feeds = list(self._feeds)
+            jobs = list(self._jobs.values())
+        for feed in feeds:
+            feed.cancel()
+        for job in jobs:
+            job.cancel()
+
+    def bandwidth_stats(self):
+        """Return the BandwidthGovernor stats, or None without a limit."""
+        return self.bandwidth.stats() if self.bandwidth else None
+
+    def result(self, job_id, timeout=None):
+        """Block until ``job_id`` finishes and return its result dict."""
+        with self._lock:
+            future = self._futures[job_id]
+        return future.result(timeout=timeout)
+
+    def results(self):
+        """Return a snapshot of the results of all finished jobs."""
+        with self._lock:
+            return dict(self._results)
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for f in self._futures.values() if not f.done())
+
+    def wait(self):
+        """Block until every queued job has finished and return all results."""
+        with self._lock:
+            futures = list(self._futures.items())
+        return {job_id: future.result() for job_id, future in futures}
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=exc_type is None, cancel_pending=exc_type is not None)
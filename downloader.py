@@ -1,7 +1,31 @@
 import sys
 import subprocess
 import json
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
 from pathlib import Path
+from urllib.parse import urlparse
+
+from download_archive import DownloadArchive, archive_key, archive_key_for_info
+from info_stream import HEAVY_FIELDS, drop_keys, iter_output, make_decoder
+from metadata_cache import MetadataCache
+from performance import DEFAULT_PROFILE, performance_args, resolve_performance
+from progress_parser import ProgressEvent, ProgressParser, progress_template_args
+from bandwidth_governor import BandwidthGovernor
+from process_control import (
+    hidden_startupinfo,
+    kill_process_tree,
+    process_group_kwargs,
+)
+from progress_throttle import DEFAULT_PROGRESS_RATE, ProgressThrottle
+from retry_policy import RetryPolicy, classify_errors
+from stall_watchdog import StallWatchdog
+from ytdlp_worker import get_worker_pool
 
 
 def get_base_dir():
@@ -36,13 +60,368 @@ def get_bin_paths():
     return bin_dir / "yt-dlp.exe", bin_dir / "ffmpeg.exe"
 
 
+FILEPATH_PREFIX = "[filepath] "
+ARCHIVE_PREFIX = "[archive] "
+# yt-dlp's socket timeout when --socket-timeout is not given
+# (yt_dlp.networking.common.DEFAULT_TIMEOUT)
+YT_DLP_SOCKET_TIMEOUT = 20
+STAGING_DIR_NAME = ".yt-dlp-staging"
+
+# "subprocess" spawns bin/yt-dlp.exe for every call; "pool" hands the same
+# arguments to long-lived worker processes that import the yt_dlp module once
+# (see ytdlp_worker.py); "library" runs yt_dlp.YoutubeDL in this process.
+# "auto" uses "library" when the yt_dlp module is importable, except in the
+# frozen app, which keeps using the bin/yt-dlp.exe its updater maintains.
+# "pool" and "library" fall back to "subprocess" if it is not installed.
+BACKENDS = ("auto", "subprocess", "pool", "library")
+DEFAULT_BACKEND = "auto"
+
+
+def load_yt_dlp_module():
+    """Return the yt_dlp module, or None if it is not installed."""
+    try:
+        import yt_dlp
+    except ImportError:
+        return None
+    return yt_dlp
+
+
+class _LibraryLogger:
+    """yt-dlp logger that keeps errors and warnings instead of printing them."""
+
+    def __init__(self):
+        self.messages = []
+
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        self.messages.append(f"WARNING: {msg}")
+
+    def error(self, msg):
+        self.messages.append(msg)
+
+
+# Extraction YoutubeDL instances shared by all threads, keyed by cookie
+# browsers: {key: (ydl, lock serialising its use)}
+_library_extractors = {}
+_library_extractors_lock = threading.Lock()
+
+
+def download_result(returncode, filepath, error_output):
+    """Build the result dict of a finished download_video run."""
+    if returncode == 0:
+        return {
+            "status": True,
+            "message": "Download succeeded",
+            "filepath": filepath,
+        }
+
+    error_msg = "Download failed"
+    if error_output:
+        error_msg += f": {'; '.join(error_output[:3])}"
+    return {"status": False, "message": error_msg, "filepath": None}
+
+
+def skipped_result(entry):
+    """Result of a download_video call answered from the download archive."""
+    return {
+        "status": True,
+        "message": "Already downloaded",
+        "filepath": entry["filepath"],
+        "skipped": True,
+    }
+
+
+def cancelled_result():
+    return {
+        "status": False,
+        "message": "Download cancelled",
+        "filepath": None,
+        "cancelled": True,
+    }
+
+
+class DownloadOutput:
+    """Interpret the output of a yt-dlp download started by download_video.
+
+    ``feed`` takes one line and the stream it came from and returns a
+    ProgressEvent for progress lines, None otherwise. It keeps track of
+    the file being written, the final path printed after the move, the
+    video's download-archive key and any ERROR/WARNING lines.
+    """
+
+    def __init__(self):
+        self._parser = ProgressParser()
+        self.current_file = None
+        self.final_file = None
+        self.archive_key = None
+        self.error_output = []
+        # yt-dlp prints some errors as "ERROR: \r<message>", which text-mode
+        # pipes split into two lines
+        self._error_continues = False
+
+    @property
+    def filepath(self):
+        return self.final_file or self.current_file
+
+    def feed(self, stream, line):
+        if stream == "stdout" and line.startswith(FILEPATH_PREFIX):
+            try:
+                self.final_file = json.loads(line[len(FILEPATH_PREFIX) :])
+            except ValueError:
+                pass
+            return None
+        if stream == "stdout" and line.startswith(ARCHIVE_PREFIX):
+            extractor, _, video_id = line[len(ARCHIVE_PREFIX) :].strip().partition(" ")
+            self.archive_key = archive_key(extractor, video_id)
+            return None
+
+        event = self._parser.parse(line)
+        if event is None:
+            if stream != "stderr":
+                return None
+            if self._error_continues:
+                self._error_continues = False
+                self.error_output[-1] += " " + line.strip()
+            elif "ERROR:" in line or "WARNING:" in line:
+                self.error_output.append(line.strip())
+                self._error_continues = line.strip() in ("ERROR:", "WARNING:")
+            return None
+
+        if event.is_download:
+            if event.filename:
+                self.current_file = event.filename
+        elif event.filepath:
+            self.current_file = event.filepath
+        return event
+
+
+def source_info_file(staging_dir):
+    """Path of the info JSON a download is (re)started from."""
+    return Path(staging_dir) / "source.info.json"
+
+
+def iter_process_output(process, timeout=None):
+    """Yield ``(stream, line)`` from a child's stdout and stderr as they arrive.
+
+    Both pipes are drained by reader threads into one queue, so neither can
+    fill up and block the child while the other is being read. With a
+    ``timeout``, ``(None, None)`` is yielded whenever nothing arrived for
+    that many seconds, so the caller can check on a silent child.
+    """
+    lines = queue.Queue()
+
+    def pump(name, pipe):
+        try:
+            for line in pipe:
+                lines.put((name, line))
+        finally:
+            lines.put((name, None))
+
+    open_streams = 0
+    for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr)):
+        if pipe is not None:
+            threading.Thread(target=pump, args=(name, pipe), daemon=True).start()
+            open_streams += 1
+
+    while open_streams:
+        try:
+            name, line = lines.get(timeout=timeout)
+        except queue.Empty:
+            yield None, None
+            continue
+        if line is None:
+            open_streams -= 1
+            continue
+        yield name, line
+
+
+def remove_staging_dir(staging_dir):
+    """Delete one job's staging dir, and the staging root once it is empty."""
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    try:
+        Path(staging_dir).parent.rmdir()
+    except OSError:
+        pass
+
+
+def get_cache_dir():
+    return get_base_dir() / "cache"
+
+
+_YOUTUBE_HOSTS = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+_YOUTUBE_ID_PATTERNS = [
+    re.compile(r"[?&]v=([0-9A-Za-z_-]{11})"),
+    re.compile(r"youtu\.be/([0-9A-Za-z_-]{11})"),
+    re.compile(r"/(?:embed|v|shorts|live)/([0-9A-Za-z_-]{11})"),
+]
+
+
+def extract_video_id(url):
+    """Return the YouTube video ID in ``url`` without running yt-dlp."""
+    try:
+        host = urlparse(url).netloc.lower()
+    except ValueError:
+        return None
+    if not any(host == h or host.endswith("." + h) for h in _YOUTUBE_HOSTS):
+        return None
+    for pattern in _YOUTUBE_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def entry_url(entry):
+    """Return the URL to download a ``--flat-playlist`` entry from."""
+    url = entry.get("url") or ""
+    if url.startswith(("http://", "https://")):
+        return url
+    for key in ("webpage_url", "original_url"):
+        if entry.get(key):
+            return entry[key]
+    if entry.get("ie_key") == "Youtube" and entry.get("id"):
+        return f"https://www.youtube.com/watch?v={entry['id']}"
+    return url or None
+
+
+def _iter_entries(yt_dlp_module, entries):
+    """Iterate a playlist's ``entries`` (generator, list or PagedList) lazily."""
+    if entries is None:
+        return
+    if isinstance(entries, yt_dlp_module.utils.PagedList):
+        start = 0
+        while True:
+            page = entries.getslice(start, start + 50)
+            if not page:
+                return
+            yield from page
+            start += len(page)
+    else:
+        yield from entries
+
+
+# "ERROR: [youtube] dQw4w9WgXcQ: Video unavailable" -> the video ID
+_ERROR_ID_RE = re.compile(r"ERROR: \[[^\]]+\] ([^\s:]+): ")
+
+
+def batch_error_url(message, upcoming, pending):
+    """Return the pending batch URL an ``ERROR:`` line belongs to.
+
+    ``upcoming`` lists the batch URLs after the last one answered, in
+    order. A URL containing the video ID the error names wins; otherwise
+    it is the first of them still pending.
+    """
+    candidates = [url for url in upcoming if url in pending] or pending
+    match = _ERROR_ID_RE.match(message)
+    if match:
+        for url in candidates:
+            if match[1] in url:
+                return url
+    return candidates[0]
+
+
+def cache_key_for_url(url):
+    video_id = extract_video_id(url)
+    return f"youtube:{video_id}" if video_id else None
+
+
+def archive_key_for_url(url):
+    video_id = extract_video_id(url)
+    return archive_key("youtube", video_id) if video_id else None
+
+
+def cache_key_for_info(info):
+    extractor = (info.get("extractor_key") or info.get("extractor") or "").lower()
+    video_id = info.get("id")
+    if not extractor or not video_id:
+        return None
+    return f"{extractor}:{video_id}"
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    """Return the process-wide metadata cache shared by all downloaders."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = MetadataCache(get_cache_dir() / "metadata.sqlite3")
+        return _default_cache
+
+
+_default_archive = None
+
+
+def get_download_archive():
+    """Return the process-wide download archive shared by all downloaders."""
+    global _default_archive
+    with _default_cache_lock:
+        if _default_archive is None:
+            _default_archive = DownloadArchive(
+                get_base_dir() / "download_archive.sqlite3"
+            )
+        return _default_archive
+
+
 class YTVideoDownloader:
     def __init__(
-        self, progress_hook=None, use_rich=False, browsers=None, download_dir=None
+        self,
+        progress_hook=None,
+        use_rich=False,
+        browsers=None,
+        download_dir=None,
+        use_cache=True,
+        metadata_cache=None,
+        progress_rate=DEFAULT_PROGRESS_RATE,
+        performance=DEFAULT_PROFILE,
+        backend=DEFAULT_BACKEND,
+        retry_policy=None,
+        watchdog=None,
+        bandwidth=None,
+        use_archive=True,
+        download_archive=None,
     ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+        # Transient download failures are retried, resuming the .part files;
+        # RetryPolicy(max_attempts=1) turns this off.
+        self.retry_policy = retry_policy if retry_policy else RetryPolicy()
+        # Hung or crawling attempts are killed and left to the retry policy;
+        # StallWatchdog(idle_timeout=None) turns this off.
+        self.watchdog = watchdog if watchdog else StallWatchdog()
+        # A BandwidthGovernor shared with other downloaders (or a total
+        # rate such as "5M" for this downloader alone) caps the combined
+        # download speed of all their jobs.
+        if bandwidth is not None and not isinstance(bandwidth, BandwidthGovernor):
+            bandwidth = BandwidthGovernor(bandwidth)
+        self.bandwidth = bandwidth
+        # Profile name from PERFORMANCE_PROFILES or a settings dict;
+        # download_video can override it per job.
+        self.performance = performance
+        # progress_hook is called at most progress_rate times per second
+        # (plus status changes); 0 or None passes every update through.
+        self.progress_rate = progress_rate
+        self._throttle = None
+        if progress_hook and progress_rate:
+            self._throttle = ProgressThrottle(progress_hook, progress_rate)
+            progress_hook = self._throttle
         self.progress_hook = progress_hook
         self.use_rich = use_rich
         self.browsers = browsers if browsers else []
+        self.use_cache = use_cache
+        self._metadata_cache = metadata_cache
+        # Finished downloads are recorded in the download archive, and
+        # download_video skips videos found there unless force=True.
+        self.use_archive = use_archive
+        self._download_archive = download_archive
 
         if download_dir:
             self.download_dir = Path(download_dir)
@@ -52,11 +431,221 @@ class YTVideoDownloader:
 
         self.download_dir.mkdir(parents=True, exist_ok=True)
 
-    def get_formats(self, url):
+    @property
+    def metadata_cache(self):
+        if not self.use_cache:
+            return None
+        if self._metadata_cache is None:
+            try:
+                self._metadata_cache = get_metadata_cache()
+            except Exception:
+                # An unwritable cache location must never break fetching
+                self.use_cache = False
+                return None
+        return self._metadata_cache
+
+    @property
+    def download_archive(self):
+        if not self.use_archive:
+            return None
+        if self._download_archive is None:
+            try:
+                self._download_archive = get_download_archive()
+            except Exception:
+                self.use_archive = False
+                return None
+        return self._download_archive
+
+    def archive_key(self, url, info=None):
+        """Return the download-archive key of a video without running yt-dlp.
+
+        It comes from the info, the YouTube ID in the URL, an earlier
+        download from the same URL or the metadata cache; None if the
+        video cannot be identified up front.
+        """
+        if info is not None:
+            return archive_key_for_info(info)
+        key = archive_key_for_url(url)
+        archive = self.download_archive
+        if key is None and archive is not None:
+            try:
+                key = archive.resolve(url)
+            except Exception:
+                pass
+        if key is None:
+            cached = self._cached_info(url)
+            if cached is not None:
+                key = archive_key_for_info(cached)
+        return key
+
+    def find_downloaded(self, url, info=None):
+        """Return the archive entry ``{"key", "filepath", "added"}`` of an
+        already downloaded video, or None.
+
+        Entries whose recorded file has since been deleted do not count;
+        entries imported from a yt-dlp archive file carry no path and do.
+        """
+        archive = self.download_archive
+        if archive is None:
+            return None
+        try:
+            entry = archive.get(self.archive_key(url, info))
+        except Exception:
+            return None
+        if entry and entry["filepath"] and not os.path.exists(entry["filepath"]):
+            return None
+        return entry
+
+    def _record_download(self, key, filepath, url=None):
+        archive = self.download_archive
+        if archive is None or not key:
+            return
+        try:
+            archive.add(key, filepath, aliases=[url])
+        except Exception:
+            pass
+
+    def _cached_info(self, url):
+        cache = self.metadata_cache
+        if cache is None:
+            return None
+        try:
+            return cache.get(cache_key_for_url(url) or cache.resolve(url))
+        except Exception:
+            return None
+
+    def _store_info(self, url, info):
+        cache = self.metadata_cache
+        if cache is None:
+            return
+        try:
+            key = cache_key_for_url(url) or cache_key_for_info(info)
+            aliases = {url, info.get("webpage_url"), info.get("original_url")}
+            cache.put(key, info, aliases=aliases)
+        except Exception:
+            pass
+
+    def _worker_pool(self):
+        if self.backend != "pool":
+            return None
+        pool = get_worker_pool()
+        return pool if pool.available else None
+
+    def _job_pool(self, yt_dlp):
+        """Return the worker pool to run a cancellable "auto" download on,
+        or None to spawn ``yt_dlp``.
+
+        Cancelling must kill the download's whole process tree, ffmpeg
+        included, at once. In this process yt-dlp could only be stopped at
+        its next hook, so such jobs run in a child: bin/yt-dlp.exe if it is
+        there, otherwise a pool worker (which leads its own process group).
+        """
+        if self._can_run(yt_dlp):
+            return None
+        pool = get_worker_pool()
+        return pool if pool.available else None
+
+    def _use_library(self):
+        if self.backend == "auto" and getattr(sys, "frozen", False):
+            return False
+        if self.backend not in ("auto", "library"):
+            return False
+        return load_yt_dlp_module() is not None
+
+    def _library_extractor(self):
+        """Return the process-wide extraction YoutubeDL and its lock.
+
+        Reusing it keeps yt-dlp's HTTP session, cookies and extractor
+        instances alive between get_formats calls from any thread (the
+        GUI starts a new thread for every fetch). YoutubeDL is not
+        thread-safe, so calls hold the lock; extractions run one at a time.
+        """
+        key = tuple(self.browsers)
+        with _library_extractors_lock:
+            entry = _library_extractors.get(key)
+            if entry is None:
+                yt_dlp_module = load_yt_dlp_module()
+                args = []
+                for browser in self.browsers:
+                    args.extend(["--cookies-from-browser", browser])
+                opts = yt_dlp_module.parse_options(args).ydl_opts
+                opts.update(
+                    quiet=True,
+                    noprogress=True,
+                    ignoreerrors=False,
+                    logger=_LibraryLogger(),
+                )
+                entry = _library_extractors[key] = (
+                    yt_dlp_module.YoutubeDL(opts),
+                    threading.Lock(),
+                )
+        return entry
+
+    def _library_get_formats(self, url):
+        yt_dlp_module = load_yt_dlp_module()
+        try:
+            ydl, lock = self._library_extractor()
+            with lock:
+                ydl.params["logger"].messages.clear()
+                info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        except yt_dlp_module.utils.DownloadError as e:
+            return {"status": False, "message": f"Failed to fetch formats: {e}"}
+        except Exception as e:
+            return {"status": False, "message": str(e)}
+
+        self._store_info(url, info)
+        return {
+            "status": True,
+            "formats": info.get("formats", []),
+            "info": info,
+            "cached": False,
+        }
+
+    def _can_run(self, yt_dlp):
+        return self._worker_pool() is not None or yt_dlp.exists()
+
+    def _popen(self, cmd, merge_stderr=False, pool=None):
+        """Start yt-dlp with ``cmd`` on the configured backend.
+
+        Returns a Popen, or a Popen-like PooledProcess in pool mode (or
+        when ``pool`` is given), with text-mode ``stdout``/``stderr`` line
+        streams. ``merge_stderr`` sends stderr into stdout, in order.
+        """
+        pool = pool or self._worker_pool()
+        if pool is not None:
+            process = pool.run(cmd[1:], merge_stderr=merge_stderr)
+            if process is not None:
+                return process
+        return subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+            startupinfo=hidden_startupinfo(),
+            **process_group_kwargs(),
+        )
+
+    def get_formats(self, url, refresh=False):
+        if not refresh:
+            info = self._cached_info(url)
+            if info is not None:
+                return {
+                    "status": True,
+                    "formats": info.get("formats", []),
+                    "info": info,
+                    "cached": True,
+                }
+
+        if self._use_library():
+            return self._library_get_formats(url)
+
         try:
             yt_dlp, _ = get_bin_paths()
 
-            if not yt_dlp.exists():
+            if not self._can_run(yt_dlp):
                 return {
                     "status": False,
                     "message": "yt-dlp.exe not found in bin folder",
@@ -68,22 +657,23 @@ class YTVideoDownloader:
                 for browser in self.browsers:
                     cmd.extend(["--cookies-from-browser", browser])
 
-            # Hide console window on Windows
-            startupinfo = None
-            if sys.platform == "win32":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, check=True, timeout=60,
-                startupinfo=startupinfo
-            )
+            process = self._popen(cmd)
+            try:
+                stdout, stderr = process.communicate(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+            if process.returncode != 0:
+                raise subprocess.CalledProcessError(
+                    process.returncode, cmd, stdout, stderr
+                )
 
-            info = json.loads(result.stdout)
+            info = json.loads(stdout)
             formats = info.get("formats", [])
+            self._store_info(url, info)
 
-            return {"status": True, "formats": formats, "info": info}
+            return {"status": True, "formats": formats, "info": info, "cached": False}
         except subprocess.TimeoutExpired:
             return {"status": False, "message": "Request timed out"}
         except subprocess.CalledProcessError as e:
@@ -93,149 +683,783 @@ class YTVideoDownloader:
         except Exception as e:
             return {"status": False, "message": str(e)}
 
-    def download_video(self, url, format_string=None):
-        try:
-            yt_dlp, ffmpeg = get_bin_paths()
+    def get_formats_batch(self, urls, refresh=False):
+        """Fetch formats for many URLs with a single yt-dlp process.
 
-            if not yt_dlp.exists():
-                return {
+        Yields one ``get_formats``-style result dict per URL (with ``url``
+        added) as soon as it is available. Cached entries are yielded first;
+        the rest are passed to one ``yt-dlp -j --ignore-errors --no-playlist``
+        run, so a failing URL only produces a failed result for itself.
+        Infos are matched to URLs by ``original_url``/``webpage_url``;
+        entries of a playlist URL are skipped and that URL fails.
+        """
+        pending = []
+        for url in dict.fromkeys(urls):
+            info = None if refresh else self._cached_info(url)
+            if info is not None:
+                yield {
+                    "status": True,
+                    "url": url,
+                    "formats": info.get("formats", []),
+                    "info": info,
+                    "cached": True,
+                }
+            else:
+                pending.append(url)
+
+        if not pending:
+            return
+
+        if self._use_library():
+            for url in pending:
+                result = self._library_get_formats(url)
+                result["url"] = url
+                yield result
+            return
+
+        yt_dlp, _ = get_bin_paths()
+        if not self._can_run(yt_dlp):
+            for url in pending:
+                yield {
                     "status": False,
-                    "message": "yt-dlp.exe not found",
-                    "filepath": None,
+                    "url": url,
+                    "message": "yt-dlp.exe not found in bin folder",
                 }
+            return
 
-            cmd = [
-                str(yt_dlp),
-                url,
-                "-o",
-                str(self.download_dir / "%(title)s.%(ext)s"),
-                "--newline",
-                "--progress",
-                "--extractor-args",
-                "youtube:player_client=default,web",
-            ]
+        # URLs go through a batch file to stay clear of command-line limits
+        fd, batch_file = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(pending) + "\n")
 
-            if self.browsers:
-                for browser in self.browsers:
-                    cmd.extend(["--cookies-from-browser", browser])
+        cmd = [
+            str(yt_dlp),
+            "--batch-file",
+            batch_file,
+            "-j",
+            "--ignore-errors",
+            "--no-playlist",
+        ]
+        if self.browsers:
+            for browser in self.browsers:
+                cmd.extend(["--cookies-from-browser", browser])
+
+        process = None
+        playlists = set()
+        try:
+            # stderr is merged so ERROR lines arrive in order with the JSON
+            # lines; yt-dlp handles batch URLs one at a time, in order, so
+            # an ERROR line belongs to a URL after the last one answered.
+            process = self._popen(cmd, merge_stderr=True)
+            order = list(pending)
+            position = 0
+            for kind, item in iter_output(process.stdout):
+                if not pending:
+                    break
+                if kind == "info":
+                    info = item
+                    if info.get("playlist_index") is not None:
+                        playlists.add(info.get("playlist_webpage_url"))
+                        continue
+                    url = next(
+                        (
+                            info.get(key)
+                            for key in ("original_url", "webpage_url")
+                            if info.get(key) in pending
+                        ),
+                        None,
+                    )
+                    if url is None:
+                        continue
+                    pending.remove(url)
+                    position = order.index(url) + 1
+                    self._store_info(url, info)
+                    yield {
+                        "status": True,
+                        "url": url,
+                        "formats": info.get("formats", []),
+                        "info": info,
+                        "cached": False,
+                    }
+                else:
+                    url = batch_error_url(item, order[position:], pending)
+                    pending.remove(url)
+                    position = order.index(url) + 1
+                    yield {
+                        "status": False,
+                        "url": url,
+                        "message": f"Failed to fetch formats: {item}",
+                    }
+            process.wait()
+        except Exception as e:
+            for url in pending:
+                yield {"status": False, "url": url, "message": str(e)}
+            pending = []
+        finally:
+            if process and process.poll() is None:
+                process.kill()
+                process.wait()
+            try:
+                os.remove(batch_file)
+            except OSError:
+                pass
 
-            is_audio_conversion = format_string in ["mp3", "wav"]
+        for url in pending:
+            if url in playlists:
+                message = "Failed to fetch formats: URL is a playlist"
+            else:
+                message = "Failed to fetch formats: no output from yt-dlp"
+            yield {"status": False, "url": url, "message": message}
 
-            if ffmpeg.exists():
-                cmd.extend(["--ffmpeg-location", str(ffmpeg.parent)])
-            elif is_audio_conversion:
-                return {
-                    "status": False,
-                    "message": "ffmpeg.exe not found (required for audio conversion)",
-                    "filepath": None,
+    def iter_info(self, url, drop_fields=HEAVY_FIELDS):
+        """Stream the info of ``url`` without buffering yt-dlp's output.
+
+        yt-dlp runs with ``-j``, which prints one JSON document per video
+        (one per entry for playlists and channels). Each line is decoded as
+        it arrives and yielded as ``{"status": True, "info": ...}``; errors
+        are yielded as ``{"status": False, "message": ...}`` and the stream
+        continues with the next entry. ``drop_fields`` keys are discarded
+        during decoding, so these slimmed infos are meant for listing and
+        format selection, not for ``download_fetched``. The library backend
+        extracts the same infos in-process, one entry at a time.
+        """
+        if self._use_library():
+            for kind, item in self._library_iter_output(url, flat=False):
+                if kind == "info":
+                    yield {"status": True, "info": drop_keys(item, drop_fields)}
+                else:
+                    yield {"status": False, "message": item}
+            return
+
+        yt_dlp, _ = get_bin_paths()
+        if not self._can_run(yt_dlp):
+            yield {"status": False, "message": "yt-dlp.exe not found in bin folder"}
+            return
+
+        cmd = [str(yt_dlp), url, "-j", "--ignore-errors"]
+        if self.browsers:
+            for browser in self.browsers:
+                cmd.extend(["--cookies-from-browser", browser])
+
+        process = None
+        try:
+            process = self._popen(cmd, merge_stderr=True)
+            decode = make_decoder(drop_fields)
+            for kind, item in iter_output(process.stdout, decode):
+                if kind == "info":
+                    yield {"status": True, "info": item}
+                else:
+                    yield {"status": False, "message": item}
+            process.wait()
+        except Exception as e:
+            yield {"status": False, "message": str(e)}
+        finally:
+            if process and process.poll() is None:
+                process.kill()
+                process.wait()
+
+    def iter_playlist(self, url):
+        """Enumerate the entries of a playlist or channel lazily.
+
+        yt-dlp runs with ``--flat-playlist -j``, which lists the entries
+        page by page without extracting each video, and every line is
+        yielded as ``{"status": True, "url": ..., "entry": ...}`` as soon
+        as it arrives. Nothing is buffered, so the caller can start
+        downloading (and fetch each entry's metadata) while the listing
+        continues; stopping the iteration kills yt-dlp. A single video URL
+        yields one entry. The library backend lists the same entries
+        in-process (``_library_iter_output``).
+        """
+        if self._use_library():
+            for kind, item in self._library_iter_output(url, flat=True):
+                if kind == "info":
+                    yield {"status": True, "url": entry_url(item), "entry": item}
+                else:
+                    yield {"status": False, "message": item}
+            return
+
+        yt_dlp, _ = get_bin_paths()
+        if not self._can_run(yt_dlp):
+            yield {"status": False, "message": "yt-dlp.exe not found in bin folder"}
+            return
+
+        cmd = [str(yt_dlp), url, "--flat-playlist", "-j", "--ignore-errors"]
+        if self.browsers:
+            for browser in self.browsers:
+                cmd.extend(["--cookies-from-browser", browser])
+
+        process = None
+        try:
+            process = self._popen(cmd, merge_stderr=True)
+            for kind, item in iter_output(process.stdout):
+                if kind == "info":
+                    yield {"status": True, "url": entry_url(item), "entry": item}
+                else:
+                    yield {"status": False, "message": item}
+            process.wait()
+        except Exception as e:
+            yield {"status": False, "message": str(e)}
+        finally:
+            if process and process.poll() is None:
+                kill_process_tree(process.pid)
+                process.kill()
+                process.wait()
+
+    def _library_iter_output(self, url, flat):
+        """What ``yt-dlp -j --ignore-errors`` (``--flat-playlist`` if ``flat``)
+        prints for ``url``, from yt_dlp.YoutubeDL in this process.
+
+        Yields the same ``("info", dict)`` and ``("error", str)`` pairs as
+        ``iter_output``. The page is extracted without processing its
+        entries, and the extractor's entries generator is consumed only as
+        the caller asks for more, so pages are fetched on demand. Each
+        listing gets its own YoutubeDL rather than the shared extractor: it
+        may last as long as the downloads it feeds and must not hold its lock.
+        """
+        yt_dlp_module = load_yt_dlp_module()
+        args = ["--ignore-errors"]
+        if flat:
+            args.append("--flat-playlist")
+        for browser in self.browsers:
+            args.extend(["--cookies-from-browser", browser])
+        opts = yt_dlp_module.parse_options(args).ydl_opts
+        logger = _LibraryLogger()
+        opts.update(quiet=True, noprogress=True, logger=logger)
+
+        def errors():
+            messages = [m for m in logger.messages if m.startswith("ERROR:")]
+            logger.messages.clear()
+            return [("error", m) for m in messages]
+
+        def process(ydl, info, extra_info=None):
+            info = ydl.process_ie_result(info, download=False, extra_info=extra_info)
+            if not info:
+                return []
+            if info.get("_type") in ("playlist", "multi_video"):
+                # A nested playlist, resolved as a whole
+                return [("info", ydl.sanitize_info(e)) for e in info["entries"] if e]
+            return [("info", ydl.sanitize_info(info))]
+
+        try:
+            with yt_dlp_module.YoutubeDL(opts) as ydl:
+                result = ydl.extract_info(url, download=False, process=False)
+                # Follow redirects to the extractor that lists the page
+                for _ in range(5):
+                    if not result or result.get("_type") not in (
+                        "url",
+                        "url_transparent",
+                    ):
+                        break
+                    result = ydl.extract_info(
+                        result["url"],
+                        ie_key=result.get("ie_key"),
+                        download=False,
+                        process=False,
+                    )
+                if not result:
+                    yield from errors() or [("error", f"ERROR: Failed to list {url}")]
+                    return
+                if result.get("_type") not in ("playlist", "multi_video"):
+                    if flat:
+                        yield "info", ydl.sanitize_info(result)
+                    else:
+                        yield from process(ydl, result)
+                        yield from errors()
+                    return
+                extra = {
+                    "playlist": result.get("title") or result.get("id"),
+                    "playlist_id": result.get("id"),
+                    "playlist_title": result.get("title"),
+                    "playlist_webpage_url": result.get("webpage_url"),
                 }
+                if result.get("webpage_url"):
+                    extra["webpage_url"] = result["webpage_url"]
+                entries = _iter_entries(yt_dlp_module, result.get("entries"))
+                for index, entry in enumerate(entries, 1):
+                    if not entry:
+                        continue
+                    # Flat (url) entries come back as they are, like the CLI's
+                    # --flat-playlist; embedded videos get their formats picked
+                    if flat and entry.get("_type", "video") != "video":
+                        yield "info", ydl.sanitize_info(entry)
+                        continue
+                    try:
+                        outputs = process(
+                            ydl, entry, {**extra, "playlist_index": index}
+                        )
+                    except Exception as e:
+                        outputs = [("error", f"ERROR: {e}")]
+                    yield from outputs
+                    yield from errors()
+        except Exception as e:
+            yield "error", f"ERROR: {e}"
 
-            if is_audio_conversion:
-                cmd.extend(
-                    ["-x", "--audio-format", format_string, "--audio-quality", "0"]
-                )
-                cmd.extend(["--add-metadata"])
+    def iter_formats(self, url, drop_fields=HEAVY_FIELDS):
+        """Yield ``(info, format)`` pairs for every entry of ``url`` lazily."""
+        for result in self.iter_info(url, drop_fields=drop_fields):
+            if not result["status"]:
+                continue
+            info = result["info"]
+            for fmt in info.get("formats") or ():
+                yield info, fmt
+
+    def download_fetched(
+        self, fetch_result, format_string=None, performance=None, job=None, force=False
+    ):
+        """Download using the result dict returned by ``get_formats``.
+
+        The fetched info is handed to yt-dlp with ``--load-info-json`` so the
+        extraction is not repeated. If the format URLs in the info have
+        expired (HTTP 403), the retry loop of ``download_video`` extracts
+        again from the URL.
+        """
+        info = fetch_result.get("info") if fetch_result else None
+        if not fetch_result or not fetch_result.get("status") or not info:
+            return {
+                "status": False,
+                "message": "No fetched video info to download from",
+                "filepath": None,
+            }
+
+        url = info.get("webpage_url") or info.get("original_url")
+        return self.download_video(
+            url,
+            format_string=format_string,
+            info=info,
+            performance=performance,
+            job=job,
+            force=force,
+        )
+
+    def _create_staging_dir(self):
+        """Make a private directory for one job's partial and temporary files.
+
+        It lives inside the download directory, so yt-dlp's final move of the
+        finished file into place is a same-filesystem rename.
+        """
+        root = self.download_dir / STAGING_DIR_NAME
+        for attempt in range(3):
+            root.mkdir(exist_ok=True)
+            try:
+                return Path(tempfile.mkdtemp(prefix="job-", dir=root))
+            except FileNotFoundError:
+                # Another job removed the empty root in between; recreate it
+                if attempt == 2:
+                    raise
+
+    def _download_source(self, staging_dir, url, info):
+        """Return the arguments naming what to download: the URL, or the
+        fetched info written to the staging dir for ``--load-info-json``."""
+        if info is None:
+            return [url]
+        info_file = source_info_file(staging_dir)
+        with open(info_file, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        return ["--load-info-json", str(info_file)]
+
+    def _download_args(
+        self,
+        source,
+        staging_dir,
+        format_string,
+        settings,
+        ffmpeg,
+        rate_limit=None,
+        write_info=False,
+    ):
+        """Return the yt-dlp arguments (without the executable) for one job.
+
+        ``write_info`` saves the extracted info to the staging dir, so a
+        restart can skip the extraction with ``--load-info-json``.
+        """
+        args = [
+            *source,
+            "--paths",
+            f"home:{self.download_dir}",
+            "--paths",
+            f"temp:{staging_dir}",
+            "-o",
+            "%(title)s.%(ext)s",
+            "--extractor-args",
+            "youtube:player_client=default,web",
+            *performance_args(settings),
+        ]
+
+        if rate_limit:
+            args.extend(["--limit-rate", str(int(rate_limit))])
+
+        if write_info:
+            # yt-dlp appends ".info.json"; "%" would start a template field
+            template = str(source_info_file(staging_dir))[: -len(".info.json")]
+            args.extend(
+                ["--write-info-json", "-o", "infojson:" + template.replace("%", "%%")]
+            )
+
+        if self.browsers:
+            for browser in self.browsers:
+                args.extend(["--cookies-from-browser", browser])
+
+        if ffmpeg.exists():
+            args.extend(["--ffmpeg-location", str(ffmpeg.parent)])
+
+        if format_string in ["mp3", "wav"]:
+            args.extend(["-x", "--audio-format", format_string, "--audio-quality", "0"])
+            args.extend(["--add-metadata"])
+        else:
+            if format_string:
+                args.extend(["-f", format_string])
             else:
-                if format_string:
-                    cmd.extend(["-f", format_string])
+                args.extend(["-f", "bestvideo+bestaudio/best"])
+            args.extend(
+                [
+                    "--merge-output-format",
+                    "mp4",
+                    "--add-metadata",
+                    "--embed-thumbnail",
+                ]
+            )
+        return args
+
+    def _emit_progress(self, event):
+        # The throttle builds the hook dict only for updates it delivers
+        if self._throttle:
+            self._throttle(event)
+        else:
+            self.progress_hook(event.as_dict())
+
+    def _finish_download(self, returncode, current_file, error_output, job=None):
+        if job is not None and job.cancelled:
+            return cancelled_result()
+        result = download_result(returncode, current_file, error_output)
+        if result["status"] and self.progress_hook:
+            self.progress_hook({"status": "finished", "filename": current_file})
+        return result
+
+    def _subprocess_download_cmd(self, yt_dlp, args):
+        return [
+            str(yt_dlp),
+            *args,
+            "--newline",
+            "--quiet",
+            "--progress",
+            *progress_template_args(),
+            # Report the final path once the file is in place; JSON keeps
+            # non-ASCII names intact whatever the console encoding is.
+            "--print",
+            f"after_move:{FILEPATH_PREFIX}%(filepath)j",
+            "--print",
+            f"after_move:{ARCHIVE_PREFIX}%(extractor_key)s %(id)s",
+        ]
+
+    def _run_subprocess_download(
+        self, yt_dlp, args, job=None, lease=None, pool=None
+    ):
+        """Run the job with a yt-dlp child and return the attempt's outcome:
+        ``{"returncode", "filepath", "errors", "rebalanced", "archive_key"}``."""
+        process = self._popen(self._subprocess_download_cmd(yt_dlp, args), pool=pool)
+        if job is not None:
+            job._attach(process)
+
+        output = DownloadOutput()
+        monitor = self.watchdog.monitor()
+        stalled = None
+        rebalanced = False
+        for stream, line in iter_process_output(
+            process, timeout=self.watchdog.poll_interval
+        ):
+            # Removed print() to prevent console window from appearing
+            if line is not None:
+                event = output.feed(stream, line)
+                if event is None:
+                    monitor.output()
                 else:
-                    cmd.extend(["-f", "bestvideo+bestaudio/best"])
-                cmd.extend(
-                    [
-                        "--merge-output-format",
-                        "mp4",
-                        "--add-metadata",
-                        "--embed-thumbnail",
-                    ]
+                    monitor.progress(event)
+                    if lease is not None:
+                        lease.report(event.speed if event.is_download else 0)
+                    if self.progress_hook:
+                        self._emit_progress(event)
+
+            if job is not None and job.paused:
+                monitor.reset()
+                continue
+            if stalled is None and not rebalanced:
+                stalled = monitor.check()
+                # --limit-rate is fixed for the life of the child, so a
+                # much changed share means restarting it (it resumes)
+                rebalanced = not stalled and lease is not None and (
+                    lease.needs_restart() and not monitor.postprocessing
                 )
+                if stalled or rebalanced:
+                    # The pipes close once the process tree is gone
+                    kill_process_tree(process.pid)
+                    process.kill()
+
+        process.wait()
+        if job is not None:
+            job._detach()
+        if stalled:
+            output.error_output.insert(0, f"ERROR: {stalled}")
+        return {
+            "returncode": 1 if stalled or rebalanced else process.returncode,
+            "filepath": output.filepath,
+            "errors": output.error_output,
+            "rebalanced": rebalanced,
+            "archive_key": output.archive_key,
+        }
+
+    def _run_library_download(self, args, job=None, lease=None):
+        """Run the job with yt_dlp.YoutubeDL in this process.
+
+        The same arguments as the subprocess backend are parsed with
+        ``yt_dlp.parse_options``; progress comes from yt-dlp's own hooks
+        instead of parsed output. The stall watchdog runs in the hooks, and
+        yt-dlp's socket timeout covers connections that hang outright.
+        A new bandwidth share is applied to the running download directly.
+        Each download gets its own YoutubeDL, since output paths, formats,
+        rate limit and hooks differ per job; only extraction for
+        get_formats shares one (``_library_extractor``).
+        Returns the same dict as ``_run_subprocess_download``.
+        """
+        yt_dlp_module = load_yt_dlp_module()
+        logger = _LibraryLogger()
+        files = {"current": None, "final": None, "archive_key": None}
+        monitor = self.watchdog.monitor()
+        stalled = []
+
+        def checkpoint():
+            # Pausing blocks here; cancelling aborts yt-dlp from its own hook,
+            # so it waits for the next one (and never reaches ffmpeg)
+            if job is not None:
+                was_paused = job.paused
+                if not job._checkpoint():
+                    raise yt_dlp_module.utils.DownloadCancelled("Download cancelled")
+                if was_paused:
+                    monitor.reset()
 
-            # Hide console window on Windows
-            startupinfo = None
-            if sys.platform == "win32":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                startupinfo=startupinfo
+        def progress_hook(d):
+            checkpoint()
+            info = d.get("info_dict") or {}
+            files["archive_key"] = archive_key_for_info(info) or files["archive_key"]
+            event = ProgressEvent("download", d, info)
+            monitor.progress(event)
+            if lease is not None:
+                lease.report(event.speed)
+            reason = monitor.check()
+            if reason:
+                stalled.append(reason)
+                raise yt_dlp_module.utils.DownloadCancelled(reason)
+            if event.filename:
+                files["current"] = event.filename
+            if self.progress_hook:
+                self._emit_progress(event)
+
+        def postprocessor_hook(d):
+            checkpoint()
+            event = ProgressEvent("postprocess", d, d.get("info_dict") or {})
+            monitor.progress(event)
+            if event.filepath:
+                files["current"] = event.filepath
+            if self.progress_hook:
+                self._emit_progress(event)
+
+        def post_hook(filepath):
+            files["final"] = filepath
+
+        parsed = yt_dlp_module.parse_options(args)
+        opts = parsed.ydl_opts
+        opts.update(
+            quiet=True,
+            noprogress=True,
+            logger=logger,
+            progress_hooks=[progress_hook],
+            postprocessor_hooks=[postprocessor_hook],
+            post_hooks=[post_hook],
+        )
+        if self.watchdog.idle_timeout:
+            # Only ever tighten yt-dlp's own timeout, which usually catches
+            # a hung connection long before the watchdog would
+            opts["socket_timeout"] = min(
+                opts.get("socket_timeout") or YT_DLP_SOCKET_TIMEOUT,
+                self.watchdog.idle_timeout,
             )
+        if job is not None:
+            job._start()
+        try:
+            with yt_dlp_module.YoutubeDL(opts) as ydl:
+                if lease is not None:
+                    # yt-dlp's downloaders read params["ratelimit"] as they go
+                    def set_rate(rate):
+                        ydl.params["ratelimit"] = rate
+                        lease.apply()
 
-            current_file = None
-            error_output = []
-            for line in process.stdout:
-                # Removed print() to prevent console window from appearing
+                    lease.on_change = set_rate
+                if parsed.options.load_info_filename is not None:
+                    returncode = ydl.download_with_info_file(
+                        parsed.options.load_info_filename
+                    )
+                else:
+                    returncode = ydl.download(parsed.urls)
+        except yt_dlp_module.utils.DownloadError as e:
+            if not logger.messages:
+                logger.messages.append(str(e))
+            returncode = 1
+        except yt_dlp_module.utils.DownloadCancelled:
+            returncode = 1
+        finally:
+            if lease is not None:
+                lease.on_change = None
 
-                if "ERROR:" in line or "WARNING:" in line:
-                    error_output.append(line.strip())
+        error_output = [
+            m.replace("\r", "").strip()
+            for m in logger.messages
+            if "ERROR:" in m or "WARNING:" in m
+        ]
+        if stalled:
+            error_output.insert(0, f"ERROR: {stalled[0]}")
+        return {
+            "returncode": returncode,
+            "filepath": files["final"] or files["current"],
+            "errors": error_output,
+            "rebalanced": False,
+            "archive_key": files["archive_key"],
+        }
 
-                if self.progress_hook:
-                    progress_data = {
-                        "status": "downloading",
-                        "percent": 0,
-                        "speed": 0,
-                        "downloaded": 0,
-                        "total": 0,
-                        "filename": None,
-                    }
+    def download_video(
+        self,
+        url,
+        format_string=None,
+        info=None,
+        performance=None,
+        job=None,
+        force=False,
+    ):
+        """Download ``url`` and return ``{"status", "message", "filepath"}``.
 
-                    if "[download]" in line and "%" in line:
-                        parts = line.split()
-                        for i, part in enumerate(parts):
-                            if "%" in part:
-                                try:
-                                    progress_data["percent"] = int(
-                                        float(part.strip("%"))
-                                    )
-                                except:
-                                    pass
-                            if "MiB" in part or "KiB" in part or "GiB" in part:
-                                try:
-                                    if i > 0 and "of" in parts[i - 1]:
-                                        size_parts = parts[i - 2 : i + 1]
-                                        progress_data["downloaded"] = self._parse_size(
-                                            size_parts[0]
-                                        )
-                                        progress_data["total"] = self._parse_size(
-                                            size_parts[2]
-                                        )
-                                except:
-                                    pass
-
-                    if "[download] Destination:" in line:
-                        current_file = line.split("Destination:")[-1].strip()
-                        progress_data["filename"] = current_file
-
-                    if "[ExtractAudio]" in line or "[ffmpeg]" in line:
-                        progress_data["status"] = "converting"
-
-                    self.progress_hook(progress_data)
+        ``job`` is an optional process_control.DownloadJob through which
+        another thread can cancel, pause or resume this download. A
+        cancelled download returns with ``"cancelled": True``. With a job,
+        the "auto" backend downloads in a child process (``_job_pool``). A video
+        already in the download archive is not fetched again unless
+        ``force`` is set; the result then has ``"skipped": True``.
+        """
+        staging_dir = None
+        lease = None
+        try:
+            if job is not None and job.cancelled:
+                return cancelled_result()
 
-            process.wait()
+            known_key = self.archive_key(url, info) if self.use_archive else None
+            if not force:
+                entry = self.find_downloaded(url, info)
+                if entry is not None:
+                    return skipped_result(entry)
 
-            if process.returncode == 0:
-                if not current_file:
-                    files = list(self.download_dir.glob("*.*"))
-                    if files:
-                        current_file = str(max(files, key=lambda p: p.stat().st_mtime))
+            yt_dlp, ffmpeg = get_bin_paths()
+            settings = resolve_performance(self.performance, performance)
+            use_library = self._use_library()
+            pool = None
+            if use_library and job is not None and self.backend == "auto":
+                pool = self._job_pool(yt_dlp)
+                use_library = pool is None and not self._can_run(yt_dlp)
 
-                if self.progress_hook:
-                    self.progress_hook({"status": "finished", "filename": current_file})
+            if not use_library and not self._can_run(yt_dlp) and pool is None:
+                return {
+                    "status": False,
+                    "message": "yt-dlp.exe not found",
+                    "filepath": None,
+                }
 
+            if format_string in ["mp3", "wav"] and not ffmpeg.exists():
                 return {
-                    "status": True,
-                    "message": "Download succeeded",
-                    "filepath": current_file,
+                    "status": False,
+                    "message": "ffmpeg.exe not found (required for audio conversion)",
+                    "filepath": None,
                 }
-            else:
-                error_msg = "Download failed"
-                if error_output:
-                    error_msg += f": {'; '.join(error_output[:3])}"
-                return {"status": False, "message": error_msg, "filepath": None}
+
+            # .part files, unmerged formats and thumbnails stay in the
+            # job's staging dir; only the finished file is moved to home.
+            staging_dir = self._create_staging_dir()
+
+            source = self._download_source(staging_dir, url, info)
+            if self.bandwidth is not None:
+                lease = self.bandwidth.acquire()
+            policy = self.retry_policy
+            attempt = 0
+            time_lost = 0.0
+            retry_reasons = []
+            while True:
+                attempt += 1
+                started = time.monotonic()
+                rate_limit = lease.apply() if lease is not None else None
+                args = self._download_args(
+                    source,
+                    staging_dir,
+                    format_string,
+                    settings,
+                    ffmpeg,
+                    rate_limit,
+                    # Keep the info for a restart with a new bandwidth share
+                    write_info=rate_limit is not None and source == [url],
+                )
+                if use_library:
+                    run = self._run_library_download(args, job, lease)
+                else:
+                    run = self._run_subprocess_download(
+                        yt_dlp, args, job, lease, pool
+                    )
+                if run["returncode"] == 0 or (job is not None and job.cancelled):
+                    break
+                if run["rebalanced"]:
+                    # Not a failure: start again at once with the new share,
+                    # from the info the killed child saved if it got that far
+                    attempt -= 1
+                    info_file = source_info_file(staging_dir)
+                    if source == [url] and info_file.exists():
+                        source = ["--load-info-json", str(info_file)]
+                    continue
+
+                category = classify_errors(run["errors"])
+                if not policy.should_retry(category, attempt):
+                    break
+                retry_reasons.append(category)
+                delay = policy.delay(attempt, category)
+                if self.progress_hook:
+                    self.progress_hook(
+                        {
+                            "status": "retrying",
+                            "attempt": attempt + 1,
+                            "reason": category,
+                            "delay": delay,
+                            "filename": run["filepath"],
+                        }
+                    )
+                if job is not None:
+                    if job.wait_cancelled(delay):
+                        break
+                else:
+                    time.sleep(delay)
+                time_lost += time.monotonic() - started
+
+                # The staging dir is kept, so the next attempt resumes the
+                # .part files. A 403 usually means the format URLs in the
+                # fetched info expired, so extract again from the URL.
+                if category == "forbidden" and info is not None and url:
+                    source = [url]
+
+            result = self._finish_download(
+                run["returncode"], run["filepath"], run["errors"], job
+            )
+            if result["status"]:
+                self._record_download(
+                    run["archive_key"] or known_key, result["filepath"], url
+                )
+            # time_lost: seconds spent in failed attempts and backoff waits
+            result.update(
+                attempts=attempt,
+                time_lost=round(time_lost, 2),
+                retry_reasons=retry_reasons,
+            )
+            return result
 
         except subprocess.TimeoutExpired:
             return {"status": False, "message": "Download timed out", "filepath": None}
@@ -251,16 +1475,12 @@ class YTVideoDownloader:
                 "message": f"Download failed: {e}",
                 "filepath": None,
             }
-
-    def _parse_size(self, size_str):
-        try:
-            size_str = size_str.strip()
-            if "GiB" in size_str:
-                return float(size_str.replace("GiB", "")) * 1024 * 1024 * 1024
-            elif "MiB" in size_str:
-                return float(size_str.replace("MiB", "")) * 1024 * 1024
-            elif "KiB" in size_str:
-                return float(size_str.replace("KiB", "")) * 1024
-            return 0
-        except:
-            return 0
+        finally:
+            if lease is not None:
+                lease.release()
+            if job is not None:
+                job._finish()
+            if self._throttle:
+                self._throttle.flush()
+            if staging_dir:
+                remove_staging_dir(staging_dir)
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import curl_cffi
+
+
+# (connect, read) seconds. For streamed responses the read part is a stall
+# timeout rather than a limit on the whole transfer.
+DEFAULT_TIMEOUT = (15, 60)
+# Attempts for a request that fails before a response arrives or gets one
+# of RETRY_STATUSES back. A body that breaks off mid-stream is not retried
+# here; callers resume it with a Range request.
+DEFAULT_RETRIES = 3
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IMPERSONATE = "chrome"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide curl_cffi Session used for all tool downloads.
+
+    Each thread gets its own curl handle, so the session is safe to share.
+    Plain requests (release lookups, checksums) go through that handle,
+    which keeps connections alive between requests with their TLS sessions
+    and DNS answers; the Chrome impersonation negotiates HTTP/2 wherever the
+    server offers it. curl_cffi serves every ``stream=True`` request from a
+    duplicate of the handle that starts without connections, and it does
+    not expose curl's share interface, so each streamed transfer (the
+    yt-dlp binary, every ffmpeg segment) opens a connection of its own.
+    Against the size of those transfers the handshake hardly counts.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = curl_cffi.Session(
+                impersonate=IMPERSONATE, timeout=DEFAULT_TIMEOUT
+            )
+        return _session
+
+
+def request(method, url, retries=DEFAULT_RETRIES, **kwargs):
+    """Send a request through the shared session, retrying transient failures.
+
+    Takes the keyword arguments of ``curl_cffi.Session.request``. Returns the
+    last response, whatever its status; raises ``curl_cffi.CurlError`` if no
+    attempt got a response at all.
+    """
+    session = get_session()
+    for attempt in range(1, retries + 1):
+        try:
+            response = session.request(method, url, **kwargs)
+        except curl_cffi.CurlError:
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            response.close()
+        time.sleep(min(2 ** (attempt - 1), 8))
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def write_stream(response, write, block_size, stop=None):
+    """Pass the body of a ``stream=True`` response to ``write`` in blocks.
+
+    curl hands over small pieces; they are collected into blocks of at
+    least ``block_size`` bytes. What arrived is written also when the
+    connection drops, before the error propagates, so the caller can resume
+    from there. A set ``stop`` event ends the transfer early.
+    """
+    buffer = bytearray()
+    try:
+        for chunk in response.iter_content():
+            buffer += chunk
+            if len(buffer) >= block_size:
+                write(buffer)
+                buffer.clear()
+            if stop is not None and stop.is_set():
+                return
+    finally:
+        # Keep what arrived, also when the connection dropped
+        if buffer:
+            write(buffer)
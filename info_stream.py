@@ -0,0 +1,62 @@
+import json
+
+
+# Fields yt-dlp emits that the downloader never reads. Together they are
+# usually the bulk of an info dict (per-format fragment lists especially).
+HEAVY_FIELDS = frozenset(
+    {"thumbnails", "automatic_captions", "heatmap", "fragments"}
+)
+
+
+def make_decoder(drop_fields=None):
+    """Return a JSON decode function that discards ``drop_fields`` keys.
+
+    Keys are dropped at every nesting level as each object is decoded, so
+    the heavy sub-trees are released straight away instead of staying
+    referenced by the finished dict.
+    """
+    if not drop_fields:
+        return json.loads
+    drop_fields = frozenset(drop_fields)
+
+    def pairs_hook(pairs):
+        return {key: value for key, value in pairs if key not in drop_fields}
+
+    decoder = json.JSONDecoder(object_pairs_hook=pairs_hook)
+    return decoder.decode
+
+
+def drop_keys(value, drop_fields=None):
+    """Return ``value`` without ``drop_fields`` keys at any nesting level.
+
+    The counterpart of ``make_decoder`` for infos that were never JSON.
+    """
+    if not drop_fields:
+        return value
+    if isinstance(value, dict):
+        return {
+            key: drop_keys(item, drop_fields)
+            for key, item in value.items()
+            if key not in drop_fields
+        }
+    if isinstance(value, list):
+        return [drop_keys(item, drop_fields) for item in value]
+    return value
+
+
+def iter_output(stream, decode=json.loads):
+    """Read yt-dlp ``-j`` output (stderr merged in) one line at a time.
+
+    Yields ``("info", dict)`` for every JSON document and ``("error", str)``
+    for every ``ERROR:`` line. Other output (warnings, notices) is skipped.
+    """
+    for line in stream:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if line.startswith("{"):
+            try:
+                yield "info", decode(line)
+            except ValueError:
+                continue
+        elif line.startswith("ERROR:"):
+            yield "error", line.strip()
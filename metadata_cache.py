@@ -0,0 +1,122 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+
+# yt-dlp format URLs (googlevideo) expire after a few hours, so cached info
+# must not outlive them by default.
+DEFAULT_TTL = 2 * 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class MetadataCache:
+    """SQLite-backed cache of yt-dlp info dicts keyed by canonical video ID.
+
+    Entries are stored as zlib-compressed JSON. Expired entries are ignored
+    and purged, and once the compressed payloads exceed ``max_bytes`` the
+    least recently used entries are evicted. URLs that do not carry a
+    recognisable video ID can be mapped onto a key with ``aliases``.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS aliases (url TEXT PRIMARY KEY, key TEXT NOT NULL)"
+            )
+
+    def _connect(self):
+        # One short-lived connection per call keeps the cache usable from
+        # the GUI's worker threads without sharing a connection.
+        return sqlite3.connect(self.path, timeout=10)
+
+    def resolve(self, url):
+        """Return the cache key previously recorded for ``url``, if any."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT key FROM aliases WHERE url = ?", (url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get(self, key):
+        if not key:
+            return None
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            data, created = row
+            if now - created > self.ttl:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            conn.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+            )
+        try:
+            return json.loads(zlib.decompress(data))
+        except (zlib.error, ValueError):
+            self.delete(key)
+            return None
+
+    def put(self, key, info, aliases=()):
+        if not key:
+            return
+        data = zlib.compress(
+            json.dumps(info, separators=(",", ":")).encode("utf-8"), 6
+        )
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, data, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO aliases (url, key) VALUES (?, ?)",
+                [(url, key) for url in aliases if url],
+            )
+            self._evict(conn, now)
+
+    def delete(self, key):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM aliases")
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed ASC"
+            ).fetchall()
+            stale = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        conn.execute("DELETE FROM aliases WHERE key NOT IN (SELECT key FROM entries)")
@@ -0,0 +1,87 @@
+import shutil
+import sys
+from pathlib import Path
+
+
+# Named download profiles. Keys:
+#   concurrent_fragments  DASH/HLS fragments fetched in parallel (-N)
+#   http_chunk_size       split plain HTTP downloads into ranged requests
+#   buffer_size           download buffer size
+#   aria2c                hand plain HTTP downloads to aria2c if available
+#   aria2c_connections    connections aria2c opens per file
+PERFORMANCE_PROFILES = {
+    "default": {},
+    "balanced": {
+        "concurrent_fragments": 4,
+        "http_chunk_size": "10M",
+        "buffer_size": "1M",
+    },
+    "fast": {
+        "concurrent_fragments": 8,
+        "http_chunk_size": "10M",
+        "buffer_size": "4M",
+        "aria2c": True,
+        "aria2c_connections": 8,
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+def find_aria2c():
+    """Return the aria2c executable from the bin folder or PATH, if any."""
+    base_dir = Path(
+        sys.executable if getattr(sys, "frozen", False) else __file__
+    ).resolve().parent
+    for name in ("aria2c.exe", "aria2c"):
+        candidate = base_dir / "bin" / name
+        if candidate.exists():
+            return str(candidate)
+    return shutil.which("aria2c")
+
+
+def resolve_performance(profile=None, overrides=None):
+    """Merge a profile (name or dict) with per-job ``overrides``."""
+    if profile is None:
+        settings = {}
+    elif isinstance(profile, str):
+        if profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown performance profile: {profile}")
+        settings = dict(PERFORMANCE_PROFILES[profile])
+    else:
+        settings = dict(profile)
+
+    if isinstance(overrides, str):
+        overrides = resolve_performance(overrides)
+    if overrides:
+        settings.update(overrides)
+    return settings
+
+
+def performance_args(settings):
+    """Translate performance settings into yt-dlp command-line arguments."""
+    args = []
+    if not settings:
+        return args
+
+    fragments = settings.get("concurrent_fragments")
+    if fragments and int(fragments) > 1:
+        args.extend(["--concurrent-fragments", str(int(fragments))])
+    if settings.get("http_chunk_size"):
+        args.extend(["--http-chunk-size", str(settings["http_chunk_size"])])
+    if settings.get("buffer_size"):
+        args.extend(["--buffer-size", str(settings["buffer_size"])])
+
+    if settings.get("aria2c"):
+        aria2c = find_aria2c()
+        if aria2c:
+            connections = int(settings.get("aria2c_connections") or 8)
+            args.extend(
+                [
+                    "--downloader",
+                    f"http:{aria2c}",
+                    "--downloader-args",
+                    f"aria2c:-x {connections} -s {connections} -k 1M",
+                ]
+            )
+    return args
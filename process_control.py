@@ -0,0 +1,178 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+
+def process_group_kwargs():
+    """Popen keyword arguments that start the child in its own process group.
+
+    Signals sent to the group then also reach ffmpeg and any other helper
+    yt-dlp starts, without touching our own process.
+    """
+    if sys.platform == "win32":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def hidden_startupinfo():
+    """Hide the console window of child processes on Windows."""
+    if sys.platform != "win32":
+        return None
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = subprocess.SW_HIDE
+    return startupinfo
+
+
+def kill_process_tree(pid):
+    """Kill ``pid`` and everything it started."""
+    if sys.platform == "win32":
+        subprocess.run(
+            ["taskkill", "/T", "/F", "/PID", str(pid)],
+            capture_output=True,
+            startupinfo=hidden_startupinfo(),
+        )
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # Not a group leader (or already gone); fall back to the process
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def signal_process_tree(pid, sig):
+    """Send ``sig`` to the process group led by ``pid``. POSIX only."""
+    try:
+        os.killpg(pid, sig)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+
+
+class DownloadJob:
+    """Handle to cancel, pause and resume a running download from any thread.
+
+    Pass it to ``YTVideoDownloader.download_video(job=...)``. Cancelling
+    kills the whole yt-dlp process tree (ffmpeg included); the partial
+    files go with the job's staging dir. Pausing stops the process group
+    with SIGSTOP, so it is not available for subprocesses on Windows.
+    Only an explicit ``backend="library"`` runs the job in this process:
+    there a cancel or pause takes effect at yt-dlp's next progress or
+    postprocessor hook, and a running ffmpeg is left to finish.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = None
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self.state = "pending"
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self.state in ("finished", "cancelled"):
+                return False
+            self._cancelled.set()
+            self.state = "cancelled"
+            process = self._process
+            # Let a paused in-process job wake up and notice the cancel
+            self._running.set()
+        if process is not None:
+            self._kill(process)
+        return True
+
+    def pause(self):
+        with self._lock:
+            if self.state != "running":
+                return False
+            process = self._process
+            if process is not None:
+                if sys.platform == "win32" or not signal_process_tree(
+                    process.pid, signal.SIGSTOP
+                ):
+                    return False
+            self._running.clear()
+            self.state = "paused"
+            return True
+
+    def resume(self):
+        with self._lock:
+            if self.state != "paused":
+                return False
+            process = self._process
+            if process is not None:
+                signal_process_tree(process.pid, signal.SIGCONT)
+            self._running.set()
+            self.state = "running"
+            return True
+
+    def wait_cancelled(self, timeout):
+        """Sleep up to ``timeout`` seconds; return True early if cancelled."""
+        return self._cancelled.wait(timeout)
+
+    def _kill(self, process):
+        kill_process_tree(process.pid)
+        try:
+            # Marks a pooled worker as gone; harmless for a Popen
+            process.kill()
+        except OSError:
+            pass
+
+    def _attach(self, process):
+        """Register the running process; kills it if already cancelled.
+
+        A job paused between two attempts stays paused: the new process is
+        stopped straight away (or, where it cannot be, the job resumes).
+        """
+        with self._lock:
+            self._process = process
+            if not self.cancelled:
+                if self.state == "paused" and (
+                    sys.platform == "win32"
+                    or not signal_process_tree(process.pid, signal.SIGSTOP)
+                ):
+                    self._running.set()
+                    self.state = "running"
+                elif self.state != "paused":
+                    self.state = "running"
+                return True
+        self._kill(process)
+        return False
+
+    def _detach(self):
+        """Forget the process of a finished attempt; the job goes on."""
+        with self._lock:
+            self._process = None
+
+    def _start(self):
+        """Mark an in-process download as running (a paused one stays paused
+        and waits in ``_checkpoint``)."""
+        with self._lock:
+            if not self.cancelled and self.state != "paused":
+                self.state = "running"
+
+    def _checkpoint(self):
+        """Called from in-process progress hooks: wait while paused, then
+        return False if the download should stop."""
+        self._running.wait()
+        return not self.cancelled
+
+    def _finish(self):
+        with self._lock:
+            self._process = None
+            if not self.cancelled:
+                self.state = "finished"
@@ -0,0 +1,282 @@
+import json
+import re
+
+
+DOWNLOAD_PREFIX = "[progress] "
+PROGRESS_PREFIX = "[progress-json] "
+
+# Passed to yt-dlp as --progress-template TYPE:TEMPLATE.
+#
+# Download updates arrive many times a second, so they are printed as one
+# "|"-separated line that is split in C: the numbers come first, raw ("NA"
+# when missing), and the free-text fields last as JSON strings, so a "|"
+# or quote in a title cannot shift the columns. The free-text tail stays
+# the same for a whole format and is only decoded when it changes. The
+# rare postprocessor updates are printed as one JSON object. Download
+# progress is written to stdout and postprocessor progress to the "screen"
+# stream (stderr under --quiet).
+_DOWNLOAD_FIELDS = (
+    "status",
+    "downloaded_bytes",
+    "total_bytes",
+    "total_bytes_estimate",
+    "speed",
+    "eta",
+    "elapsed",
+    "fragment_index",
+    "fragment_count",
+)
+PROGRESS_TEMPLATES = {
+    "download": (
+        DOWNLOAD_PREFIX
+        + "|".join(f"%(progress.{field})s" for field in _DOWNLOAD_FIELDS)
+        + "|%(info.id)s|%(progress.filename)j|%(progress.tmpfilename)j"
+        + "|%(info.title)j"
+    ),
+    "postprocess": (
+        PROGRESS_PREFIX
+        + '{"event":"postprocess","progress":%(progress.{status,postprocessor})j,'
+        + '"info":%(info.{id,title,filepath})j}'
+    ),
+}
+
+_JSON_STRING = r'("[^"\\]*(?:\\.[^"\\]*)*"|NA)'
+# The video id may itself contain "|", so it is matched lazily up to the
+# three trailing JSON strings
+_TAIL_RE = re.compile(r"(.*?)\|" + r"\|".join([_JSON_STRING] * 3) + r"\s*$")
+_decode_json = json.JSONDecoder().decode
+
+
+def _number(text):
+    if text == "NA":
+        return None
+    return int(text) if text.isdigit() else float(text)
+
+
+def _string(text):
+    return None if text == "NA" else _decode_json(text)
+
+
+def _parse_tail(tail):
+    """Return (id, filename, tmpfilename, title) of a download line's tail."""
+    match = _TAIL_RE.match(tail)
+    if match is None:
+        raise ValueError(f"Malformed progress line: {tail!r}")
+    video_id, filename, tmpfilename, title = match.groups()
+    return (
+        None if video_id == "NA" else video_id,
+        _string(filename),
+        _string(tmpfilename),
+        _string(title),
+    )
+
+
+def progress_template_args():
+    args = []
+    for kind, template in PROGRESS_TEMPLATES.items():
+        args.extend(["--progress-template", f"{kind}:{template}"])
+    return args
+
+
+class ProgressEvent:
+    """One decoded yt-dlp progress update.
+
+    ``event`` is "download" or "postprocess". Download events carry exact
+    byte counts, speed, ETA and fragment position; postprocess events carry
+    the postprocessor name and its stage ("started", "processing",
+    "finished").
+    """
+
+    __slots__ = (
+        "event",
+        "status",
+        "downloaded_bytes",
+        "total_bytes",
+        "total_bytes_estimate",
+        "speed",
+        "eta",
+        "elapsed",
+        "filename",
+        "tmpfilename",
+        "fragment_index",
+        "fragment_count",
+        "postprocessor",
+        "video_id",
+        "title",
+        "filepath",
+    )
+
+    def __init__(self, event, progress, info):
+        get = progress.get
+        self.event = event
+        self.status = get("status")
+        self.downloaded_bytes = get("downloaded_bytes")
+        self.total_bytes = get("total_bytes")
+        self.total_bytes_estimate = get("total_bytes_estimate")
+        self.speed = get("speed")
+        self.eta = get("eta")
+        self.elapsed = get("elapsed")
+        self.filename = get("filename")
+        self.tmpfilename = get("tmpfilename")
+        self.fragment_index = get("fragment_index")
+        self.fragment_count = get("fragment_count")
+        self.postprocessor = get("postprocessor")
+        self.video_id = info.get("id")
+        self.title = info.get("title")
+        self.filepath = info.get("filepath")
+
+    @property
+    def is_download(self):
+        return self.event == "download"
+
+    @property
+    def total(self):
+        return self.total_bytes or self.total_bytes_estimate
+
+    @property
+    def percent(self):
+        if self.status == "finished" and self.is_download:
+            return 100
+        total = self.total
+        if not total or self.downloaded_bytes is None:
+            return 0
+        return min(int(self.downloaded_bytes * 100 / total), 100)
+
+    def as_dict(self):
+        """Return the dict passed to ``progress_hook``.
+
+        It carries yt-dlp's own progress-hook keys (``downloaded_bytes``,
+        ``total_bytes``, ``info_dict`` ...) alongside the short ``percent``,
+        ``downloaded`` and ``total`` keys. Postprocessor stages are reported
+        with status "converting".
+        """
+        downloaded = self.downloaded_bytes or 0
+        if self.status == "finished" and self.is_download and not downloaded:
+            downloaded = self.total or 0
+        return {
+            "status": self.status if self.is_download else "converting",
+            "percent": self.percent,
+            "speed": self.speed or 0,
+            "downloaded": downloaded,
+            "total": self.total or 0,
+            "eta": self.eta,
+            "filename": self.filename or self.filepath,
+            "downloaded_bytes": downloaded,
+            "total_bytes": self.total_bytes,
+            "total_bytes_estimate": self.total_bytes_estimate,
+            "elapsed": self.elapsed,
+            "tmpfilename": self.tmpfilename,
+            "fragment_index": self.fragment_index,
+            "fragment_count": self.fragment_count,
+            "postprocessor": self.postprocessor,
+            "postprocessor_status": None if self.is_download else self.status,
+            "info_dict": {"id": self.video_id, "title": self.title},
+        }
+
+    @property
+    def hook_status(self):
+        """The ``status`` of the dict ``as_dict`` returns."""
+        return self.status if self.is_download else "converting"
+
+
+class ProgressRecord:
+    """Latest download progress of one yt-dlp process, updated in place.
+
+    ``ProgressParser`` reuses one record for every download line, so the
+    hot path allocates no event object or dict. Only the fields read per
+    line (status, bytes, speed, file name) are decoded eagerly; the rest,
+    and the hook dict, are decoded when ``as_dict`` is called, typically
+    only for the updates the ProgressThrottle lets through. ``as_dict``
+    reads the line's fields in one step, so it may be called from another
+    thread (the throttle's timer) while the record is being updated.
+    """
+
+    __slots__ = ("status", "downloaded_bytes", "speed", "filename", "_state")
+
+    event = "download"
+    is_download = True
+    postprocessor = None
+    filepath = None
+
+    def __init__(self):
+        self.status = None
+        self.downloaded_bytes = None
+        self.speed = None
+        self.filename = None
+        # (numeric fields, raw tail, decoded tail) of the last line
+        self._state = None
+
+    def update(self, fields):
+        """Take one download line split into its ten "|" fields."""
+        downloaded = _number(fields[1])
+        speed = None if fields[4] == "NA" else float(fields[4])
+        state = self._state
+        tail = fields[9]
+        if state is not None and tail == state[1]:
+            decoded = state[2]
+        else:
+            decoded = _parse_tail(tail)
+        self.status = fields[0]
+        self.downloaded_bytes = downloaded
+        self.speed = speed
+        self.filename = decoded[1]
+        self._state = (fields, tail, decoded)
+
+    @property
+    def hook_status(self):
+        return self.status
+
+    def snapshot(self):
+        """Return a standalone ProgressEvent for the current state."""
+        fields, _, (video_id, filename, tmpfilename, title) = self._state
+        progress = {
+            "status": fields[0],
+            "downloaded_bytes": _number(fields[1]),
+            "total_bytes": _number(fields[2]),
+            "total_bytes_estimate": _number(fields[3]),
+            "speed": _number(fields[4]),
+            "eta": _number(fields[5]),
+            "elapsed": _number(fields[6]),
+            "fragment_index": _number(fields[7]),
+            "fragment_count": _number(fields[8]),
+            "filename": filename,
+            "tmpfilename": tmpfilename,
+        }
+        return ProgressEvent("download", progress, {"id": video_id, "title": title})
+
+    def as_dict(self):
+        return self.snapshot().as_dict()
+
+
+class ProgressParser:
+    """Decode lines printed with ``PROGRESS_TEMPLATES``.
+
+    Download lines update and return the parser's one ``record``;
+    postprocessor lines return a new ProgressEvent.
+    """
+
+    def __init__(self):
+        self.record = ProgressRecord()
+        self._download_offset = len(DOWNLOAD_PREFIX)
+        self._offset = len(PROGRESS_PREFIX)
+
+    def parse(self, line):
+        """Return the progress of ``line``, or None for any other line."""
+        if line.startswith(DOWNLOAD_PREFIX):
+            fields = line[self._download_offset :].split("|", 9)
+            if len(fields) != 10:
+                return None
+            try:
+                self.record.update(fields)
+            except ValueError:
+                return None
+            return self.record
+        if not line.startswith(PROGRESS_PREFIX):
+            return None
+        try:
+            data = _decode_json(line[self._offset :].strip())
+        except ValueError:
+            return None
+        return ProgressEvent(
+            data.get("event"), data.get("progress") or {}, data.get("info") or {}
+        )
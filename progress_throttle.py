@@ -0,0 +1,109 @@
+import threading
+import time
+
+
+DEFAULT_PROGRESS_RATE = 10  # progress_hook calls per second per job
+
+TERMINAL_STATUSES = frozenset({"finished", "error"})
+
+
+class _JobState:
+    __slots__ = ("last_emit", "status", "pending", "timer")
+
+    def __init__(self):
+        self.last_emit = 0.0
+        self.status = None
+        self.pending = None
+        self.timer = None
+
+
+class ProgressThrottle:
+    """Coalesce progress dicts to at most ``max_rate`` hook calls per second.
+
+    Wraps a ``progress_hook``. Updates arriving faster than the rate replace
+    each other and only the latest one is delivered, at the end of the
+    current interval. Status changes (e.g. downloading -> converting) and
+    terminal events ("finished", "error") are always delivered immediately.
+    Jobs are told apart by the dicts' ``job_id`` key, so one throttle can
+    serve a whole DownloadQueue.
+
+    Instead of a dict it also takes a progress event (anything with
+    ``hook_status`` and ``as_dict()``, e.g. a ProgressRecord); the dict is
+    then only built for the updates actually delivered, from the event's
+    state at that moment.
+    """
+
+    def __init__(self, hook, max_rate=DEFAULT_PROGRESS_RATE):
+        self.hook = hook
+        self.max_rate = max_rate
+        self.interval = 1.0 / max_rate if max_rate and max_rate > 0 else 0.0
+        # The hook is called with the lock held so timer flushes can never
+        # deliver an older state after a newer one.
+        self._lock = threading.RLock()
+        self._jobs = {}
+
+    def __call__(self, d):
+        if isinstance(d, dict):
+            key = d.get("job_id")
+            status = d.get("status")
+        else:
+            key = None
+            status = d.hook_status
+            state = self._jobs.get(key)
+            if state is not None and state.pending is d and state.status == status:
+                # A reused event object (ProgressRecord) already waiting
+                # for the timer: it will deliver the object's state as it
+                # is then, so there is nothing to do
+                return
+        now = time.monotonic()
+        with self._lock:
+            state = self._jobs.get(key)
+            if state is None:
+                state = self._jobs[key] = _JobState()
+
+            urgent = status in TERMINAL_STATUSES or status != state.status
+            state.status = status
+
+            elapsed = now - state.last_emit
+            if not urgent and elapsed < self.interval:
+                state.pending = d
+                if state.timer is None:
+                    state.timer = threading.Timer(
+                        self.interval - elapsed, self._flush_job, args=(key,)
+                    )
+                    state.timer.daemon = True
+                    state.timer.start()
+                return
+
+            state.pending = None
+            state.last_emit = now
+            if status in TERMINAL_STATUSES:
+                self._cancel_timer(state)
+                del self._jobs[key]
+            self._deliver(d)
+
+    def _flush_job(self, key):
+        with self._lock:
+            state = self._jobs.get(key)
+            if state is None:
+                return
+            state.timer = None
+            pending, state.pending = state.pending, None
+            if pending is not None:
+                state.last_emit = time.monotonic()
+                self._deliver(pending)
+
+    def _deliver(self, d):
+        self.hook(d if isinstance(d, dict) else d.as_dict())
+
+    def _cancel_timer(self, state):
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+
+    def flush(self):
+        """Deliver every pending update now and stop the timers."""
+        with self._lock:
+            for key, state in list(self._jobs.items()):
+                self._cancel_timer(state)
+                self._flush_job(key)
@@ -0,0 +1,74 @@
+import random
+import re
+
+
+# yt-dlp ERROR lines worth another attempt, checked in order. Anything not
+# listed here (unavailable, private, 404, unsupported URL ...) is final.
+ERROR_CATEGORIES = [
+    # Reported by the stall watchdog after killing a hung or crawling job
+    ("stalled", re.compile(r"Download stalled")),
+    ("rate_limited", re.compile(r"HTTP Error 429|Too Many Requests", re.I)),
+    ("forbidden", re.compile(r"HTTP Error 403|Forbidden", re.I)),
+    ("throttled", re.compile(r"throttl", re.I)),
+    ("fragment", re.compile(r"fragment", re.I)),
+    ("timeout", re.compile(r"timed? ?out", re.I)),
+    (
+        "network",
+        re.compile(
+            r"HTTP Error 5\d\d|Connection (?:reset|refused|aborted)|"
+            r"IncompleteRead|Remote end closed|Temporary failure in name "
+            r"resolution|getaddrinfo failed|Network is unreachable|"
+            r"Unable to download video data|bytes read, \d+ more expected|"
+            r"Giving up after \d+ retries",
+            re.I,
+        ),
+    ),
+]
+
+# Multiplies the backoff delay; servers that asked us to slow down get
+# more room than a dropped connection
+CATEGORY_BACKOFF = {"rate_limited": 4.0, "throttled": 2.0}
+
+
+def classify_error(message):
+    """Return the retry category of one yt-dlp error line, or None."""
+    for category, pattern in ERROR_CATEGORIES:
+        if pattern.search(message):
+            return category
+    return None
+
+
+def classify_errors(lines):
+    """Return the category of the first retryable ERROR line, or None."""
+    for line in lines:
+        if "ERROR:" not in line:
+            continue
+        category = classify_error(line)
+        if category:
+            return category
+    return None
+
+
+class RetryPolicy:
+    """When and how long to wait before retrying a failed download.
+
+    ``max_attempts`` counts the first try; 1 disables retrying. The n-th
+    retry waits ``base_delay * 2 ** (n - 1)`` seconds, capped at
+    ``max_delay`` and scaled by a random factor in ``1 +- jitter`` so
+    parallel jobs that failed together do not retry together.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=2.0, max_delay=60.0, jitter=0.5):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def should_retry(self, category, attempt):
+        return category is not None and attempt < self.max_attempts
+
+    def delay(self, attempt, category=None):
+        delay = self.base_delay * 2 ** (attempt - 1)
+        delay *= CATEGORY_BACKOFF.get(category, 1.0)
+        delay = min(delay, self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -3,6 +3,8 @@ import subprocess
 import urllib.request
 from pathlib import Path
 
+from performance import DEFAULT_PROFILE, performance_args, resolve_performance
+
 
 def get_paths():
     base_dir = Path(
@@ -19,7 +21,13 @@ def get_paths():
     return str(yt_dlp), str(ffmpeg) if ffmpeg.exists() else None
 
 
-def download(url, output_dir="downloaded_videos", quality="best", audio_only=False):
+def download(
+    url,
+    output_dir="downloaded_videos",
+    quality="best",
+    audio_only=False,
+    performance=DEFAULT_PROFILE,
+):
     yt_dlp, ffmpeg = get_paths()
     if not yt_dlp:
         return False
@@ -36,6 +44,9 @@ def download(url, output_dir="downloaded_videos", quality="best", audio_only=Fal
         "--newline",
     ]
 
+    # Profile name or settings dict, see performance.PERFORMANCE_PROFILES
+    cmd.extend(performance_args(resolve_performance(performance)))
+
     if ffmpeg:
         cmd.extend(["--ffmpeg-location", str(Path(ffmpeg).parent)])
 
@@ -0,0 +1,104 @@
+import collections
+import time
+
+
+DEFAULT_IDLE_TIMEOUT = 120  # seconds without any output from yt-dlp
+
+
+def format_rate(bytes_per_second):
+    for unit in ("B/s", "KiB/s", "MiB/s"):
+        if bytes_per_second < 1024 or unit == "MiB/s":
+            return f"{bytes_per_second:.1f}{unit}"
+        bytes_per_second /= 1024
+
+
+class StallWatchdog:
+    """Settings for detecting a hung or crawling download.
+
+    A download is considered stalled when yt-dlp prints nothing for
+    ``idle_timeout`` seconds (postprocessing excepted, ffmpeg can be quiet
+    for a long time), or when ``min_speed`` is set and the throughput over
+    the last ``window`` seconds stays below it. Call ``monitor()`` for the
+    state of one download attempt.
+    """
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT, min_speed=None, window=30):
+        self.idle_timeout = idle_timeout
+        self.min_speed = min_speed  # bytes per second
+        self.window = window
+
+    @property
+    def poll_interval(self):
+        """How often the caller should call ``check`` when nothing arrives."""
+        intervals = [1.0]
+        if self.idle_timeout:
+            intervals.append(self.idle_timeout / 2)
+        return min(intervals)
+
+    def monitor(self):
+        return StallMonitor(self)
+
+
+class StallMonitor:
+    """Per-attempt watchdog state, fed from the download's output."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.last_output = time.monotonic()
+        self.postprocessing = False
+        # (time, downloaded_bytes) samples covering the speed window
+        self._samples = collections.deque()
+        self._file = None
+
+    def reset(self):
+        """Restart the clocks, e.g. after the download was paused."""
+        self.last_output = time.monotonic()
+        self._samples.clear()
+
+    def output(self):
+        """Record that yt-dlp printed something."""
+        self.last_output = time.monotonic()
+
+    def progress(self, event):
+        """Record a ProgressEvent."""
+        now = time.monotonic()
+        self.last_output = now
+        if not event.is_download:
+            self.postprocessing = event.status != "finished"
+            self._samples.clear()
+            return
+        self.postprocessing = False
+        if event.status != "downloading" or event.downloaded_bytes is None:
+            return
+        if event.filename != self._file:
+            # A new format (e.g. audio after video) starts its own count
+            self._file = event.filename
+            self._samples.clear()
+        self._samples.append((now, event.downloaded_bytes))
+        horizon = now - self.settings.window
+        # Keep one sample at or before the horizon so the window is covered
+        while len(self._samples) > 2 and self._samples[1][0] <= horizon:
+            self._samples.popleft()
+
+    def check(self):
+        """Return a reason string if the download is stalled, else None."""
+        settings = self.settings
+        now = time.monotonic()
+        idle = now - self.last_output
+        if settings.idle_timeout and not self.postprocessing:
+            if idle >= settings.idle_timeout:
+                return f"Download stalled: no output for {int(idle)}s"
+
+        if settings.min_speed and len(self._samples) >= 2:
+            first_time, first_bytes = self._samples[0]
+            last_time, last_bytes = self._samples[-1]
+            # Silence since the last sample counts as zero throughput
+            span = now - first_time
+            if span >= settings.window and last_time > first_time:
+                speed = (last_bytes - first_bytes) / span
+                if speed < settings.min_speed:
+                    return (
+                        f"Download stalled: {format_rate(speed)} over "
+                        f"{int(span)}s, below {format_rate(settings.min_speed)}"
+                    )
+        return None
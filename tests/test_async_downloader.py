@@ -0,0 +1,40 @@
+import asyncio
+
+from async_downloader import AsyncDownload
+
+
+class FakeDownloader:
+    async def _run_download(self, url, format_string, info, performance, force, emit):
+        for done in range(1, 10001):
+            emit({"status": "downloading", "downloaded_bytes": done})
+            if done % 1000 == 0:
+                await asyncio.sleep(0)
+        emit({"status": "finished", "filename": "v.mp4"})
+        return {"status": True, "filepath": "v.mp4"}
+
+
+def test_awaited_job_keeps_only_the_latest_update():
+    async def main():
+        job = AsyncDownload(FakeDownloader(), "url", None, None, None)
+        result = await job
+        return result, [d async for d in job]
+
+    result, updates = asyncio.run(main())
+
+    assert result["status"]
+    assert updates == [
+        {"status": "downloading", "downloaded_bytes": 10000},
+        {"status": "finished", "filename": "v.mp4"},
+    ]
+
+
+def test_reader_sees_progress_while_it_runs():
+    async def main():
+        job = AsyncDownload(FakeDownloader(), "url", None, None, None)
+        return [d async for d in job]
+
+    updates = asyncio.run(main())
+
+    assert 2 < len(updates) <= 12
+    assert updates[-2]["downloaded_bytes"] == 10000
+    assert updates[-1]["status"] == "finished"
@@ -0,0 +1,76 @@
+import time
+
+from bandwidth_governor import RESTART_INTERVAL, BandwidthGovernor, parse_rate
+
+
+def running(governor, count, speed=None):
+    leases = []
+    for _ in range(count):
+        lease = governor.acquire()
+        leases.append(lease)
+    for lease in leases:
+        lease.apply()
+        lease.report(lease.rate if speed is None else speed)
+    return leases
+
+
+def test_parse_rate():
+    assert parse_rate("5M") == 5 * 1024**2
+    assert parse_rate("800K") == 800 * 1024
+    assert parse_rate(1000) == 1000
+    assert parse_rate(None) is None
+
+
+def test_new_job_within_budget_restarts_nobody():
+    governor = BandwidthGovernor(1200)
+    leases = running(governor, 3)
+    new = governor.acquire()
+    new.apply()
+    new.report(new.rate)
+    # 3 x 400 + 300 = 1500 is within 25% of the budget
+    assert all(lease.rate == 300 for lease in leases)
+    assert not any(lease.needs_restart() for lease in leases)
+
+
+def test_overrun_restarts_only_as_many_as_needed():
+    governor = BandwidthGovernor(1000)
+    (first,) = running(governor, 1)
+    second = governor.acquire()
+    second.apply()
+    second.report(second.rate)
+    # 1000 + 500 is 50% over the budget
+    assert first.needs_restart()
+    # Counted as stopped: the rest is back within budget
+    assert governor.stats()["rate"] == 500
+    assert not second.needs_restart()
+
+
+def test_slow_jobs_are_not_restarted_for_a_lower_share():
+    governor = BandwidthGovernor(1000)
+    leases = running(governor, 2, speed=100)
+    governor.acquire()
+    assert not any(lease.needs_restart() for lease in leases)
+
+
+def test_higher_share_waits_and_needs_unused_budget():
+    governor = BandwidthGovernor(900)
+    first, second, third = running(governor, 3)
+    third.release()
+    assert first.rate == 450
+    # Too soon after the start
+    assert not first.needs_restart()
+
+    first.applied_at = second.applied_at = time.monotonic() - RESTART_INTERVAL
+    # 300 + 300 leaves a third of the budget unused and both run at their cap
+    assert first.needs_restart()
+    first.apply()
+    second.report(300)
+    assert second.needs_restart()
+
+
+def test_higher_share_ignored_when_not_capped():
+    governor = BandwidthGovernor(900)
+    first, second, third = running(governor, 3, speed=50)
+    third.release()
+    first.applied_at = time.monotonic() - RESTART_INTERVAL
+    assert not first.needs_restart()
@@ -0,0 +1,56 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+import download_ffmpeg
+
+SIZE = 4 * download_ffmpeg.MIN_SEGMENT_SIZE
+
+
+class SlowRanges(http.server.BaseHTTPRequestHandler):
+    """Serves SIZE bytes slowly, but fails the range starting at ``fail_at``."""
+
+    protocol_version = "HTTP/1.1"
+    fail_at = SIZE // 4
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        first, _, last = self.headers["Range"].split("=")[1].partition("-")
+        start, end = int(first), int(last or SIZE - 1)
+        if start == self.fail_at:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{SIZE}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        try:
+            for offset in range(start, end + 1, 64 * 1024):
+                self.wfile.write(b"\0" * min(64 * 1024, end + 1 - offset))
+                time.sleep(0.05)
+        except OSError:
+            pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SlowRanges)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/ffmpeg.zip"
+    server.shutdown()
+    server.server_close()
+
+
+def test_failed_segment_stops_the_others(server, tmp_path):
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="HTTP 404"):
+        download_ffmpeg.download_with_progress(server, tmp_path / "ffmpeg.zip")
+    # Each healthy segment would take over 3 s to finish
+    assert time.monotonic() - started < 2
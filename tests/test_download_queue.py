@@ -0,0 +1,39 @@
+import threading
+import time
+
+from download_queue import DownloadQueue
+from downloader import YTVideoDownloader
+
+
+def test_playlist_feed_keeps_its_backlog(tmp_path, monkeypatch):
+    entries = 3000
+    queued = []
+    release = threading.Event()
+
+    def iter_playlist(self, url):
+        for n in range(entries):
+            yield {"status": True, "url": f"https://example.com/{n}", "entry": {}}
+
+    def download_video(self, url, **kwargs):
+        release.wait(5)
+        return {"status": True, "message": "Download succeeded", "filepath": url}
+
+    monkeypatch.setattr(YTVideoDownloader, "iter_playlist", iter_playlist)
+    monkeypatch.setattr(YTVideoDownloader, "download_video", download_video)
+    queue = DownloadQueue(max_concurrent=2, download_dir=tmp_path, use_archive=False)
+    feed = queue.add_playlist("https://example.com/list", backlog=4)
+    time.sleep(0.3)
+    with queue._lock:
+        queued.append(queue._queued)
+    assert len(feed.job_ids) <= 2 + 4
+
+    started = time.monotonic()
+    release.set()
+    results = feed.results()
+    queue.shutdown()
+
+    assert queued == [4]
+    assert len(results) == entries
+    assert all(result["status"] for result in results.values())
+    # Rescanning every job per entry took 10 s here
+    assert time.monotonic() - started < 5
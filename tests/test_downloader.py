@@ -0,0 +1,101 @@
+import pytest
+
+from downloader import YTVideoDownloader
+from process_control import DownloadJob
+
+
+def test_download_fetched_failure_is_not_retried_from_the_url(tmp_path, monkeypatch):
+    calls = []
+
+    def download_video(self, url, **kwargs):
+        calls.append((url, kwargs.get("info")))
+        return {"status": False, "message": "Download failed", "attempts": 4}
+
+    monkeypatch.setattr(YTVideoDownloader, "download_video", download_video)
+    downloader = YTVideoDownloader(
+        download_dir=tmp_path, use_cache=False, use_archive=False
+    )
+    info = {"id": "x", "webpage_url": "https://example.com/watch?v=x"}
+
+    result = downloader.download_fetched({"status": True, "info": info})
+
+    assert calls == [("https://example.com/watch?v=x", info)]
+    assert result["attempts"] == 4
+
+
+@pytest.mark.parametrize("have_exe", [True, False])
+def test_auto_backend_runs_cancellable_jobs_in_a_child(
+    tmp_path, monkeypatch, have_exe
+):
+    pytest.importorskip("yt_dlp")
+    runs = []
+
+    def run_subprocess(self, yt_dlp, args, job=None, lease=None, pool=None):
+        runs.append(pool)
+        return {
+            "returncode": 0,
+            "filepath": None,
+            "errors": [],
+            "rebalanced": False,
+            "archive_key": None,
+        }
+
+    def run_library(self, *args, **kwargs):
+        raise AssertionError("cancellable job ran in this process")
+
+    monkeypatch.setattr(YTVideoDownloader, "_run_subprocess_download", run_subprocess)
+    monkeypatch.setattr(YTVideoDownloader, "_run_library_download", run_library)
+    monkeypatch.setattr(YTVideoDownloader, "_can_run", lambda self, exe: have_exe)
+    downloader = YTVideoDownloader(
+        download_dir=tmp_path, use_cache=False, use_archive=False
+    )
+
+    downloader.download_video("https://example.com/v.mp4", job=DownloadJob())
+
+    assert len(runs) == 1
+    assert (runs[0] is None) == have_exe
+
+
+class FakeBatchProcess:
+    returncode = 0
+
+    def __init__(self, lines):
+        self.stdout = iter(lines)
+
+    def poll(self):
+        return 0
+
+    def wait(self):
+        return 0
+
+
+def test_get_formats_batch_matches_output_to_urls(tmp_path, monkeypatch):
+    lines = [
+        '{"id": "e1", "webpage_url": "https://a.example/e1", "playlist_index": 1,'
+        ' "playlist_webpage_url": "https://a.example/list"}\n',
+        '{"id": "e2", "webpage_url": "https://a.example/e2", "playlist_index": 2,'
+        ' "playlist_webpage_url": "https://a.example/list"}\n',
+        "ERROR: [generic] gone: Unable to download webpage\n",
+        '{"id": "v", "original_url": "https://a.example/v"}\n',
+    ]
+    commands = []
+
+    def popen(self, cmd, merge_stderr=False, pool=None):
+        commands.append(cmd)
+        return FakeBatchProcess(lines)
+
+    monkeypatch.setattr(YTVideoDownloader, "_use_library", lambda self: False)
+    monkeypatch.setattr(YTVideoDownloader, "_can_run", lambda self, exe: True)
+    monkeypatch.setattr(YTVideoDownloader, "_popen", popen)
+    downloader = YTVideoDownloader(
+        download_dir=tmp_path, use_cache=False, use_archive=False
+    )
+    urls = ["https://a.example/list", "https://a.example/gone", "https://a.example/v"]
+
+    results = {r["url"]: r for r in downloader.get_formats_batch(urls)}
+
+    assert "--no-playlist" in commands[0]
+    assert results["https://a.example/v"]["info"]["id"] == "v"
+    assert "gone" in results["https://a.example/gone"]["message"]
+    assert not results["https://a.example/list"]["status"]
+    assert results["https://a.example/list"]["message"].endswith("is a playlist")
@@ -0,0 +1,83 @@
+import functools
+import http.server
+import threading
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from downloader import YTVideoDownloader  # noqa: E402
+
+
+@pytest.fixture
+def video_url(tmp_path):
+    (tmp_path / "clip.mp4").write_bytes(b"\0" * 4096)
+    handler = functools.partial(
+        http.server.SimpleHTTPRequestHandler, directory=str(tmp_path)
+    )
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/clip.mp4"
+    server.shutdown()
+    server.server_close()
+
+
+def make_downloader(tmp_path):
+    return YTVideoDownloader(
+        download_dir=tmp_path,
+        backend="library",
+        use_cache=False,
+        use_archive=False,
+    )
+
+
+def test_extractor_is_shared_between_threads(tmp_path, video_url):
+    extractors = []
+    results = []
+
+    def fetch():
+        downloader = make_downloader(tmp_path)
+        extractors.append(downloader._library_extractor())
+        results.append(downloader.get_formats(video_url))
+
+    threads = [threading.Thread(target=fetch) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert len({id(ydl) for ydl, _ in extractors}) == 1
+    assert all(result["status"] for result in results), results
+    assert results[0]["info"]["id"] == "clip"
+
+
+def test_iter_playlist_lists_embedded_videos(tmp_path, video_url):
+    base = video_url.rsplit("/", 1)[0]
+    videos = "".join(f'<video src="clip{n}.mp4"></video>' for n in range(3))
+    (tmp_path / "page.html").write_text(f"<html><body>{videos}</body></html>")
+
+    entries = list(make_downloader(tmp_path).iter_playlist(f"{base}/page.html"))
+
+    assert [entry["status"] for entry in entries] == [True] * 3
+    assert [entry["url"] for entry in entries] == [
+        f"{base}/clip{n}.mp4" for n in range(3)
+    ]
+
+
+def test_iter_info_runs_in_process(tmp_path, video_url, monkeypatch):
+    monkeypatch.setattr(YTVideoDownloader, "_can_run", lambda self, exe: False)
+    base = video_url.rsplit("/", 1)[0]
+    videos = "".join(f'<video src="clip{n}.mp4"></video>' for n in range(2))
+    (tmp_path / "page.html").write_text(f"<html><body>{videos}</body></html>")
+    downloader = make_downloader(tmp_path)
+
+    results = list(downloader.iter_info(f"{base}/page.html"))
+    missing = list(downloader.iter_info(f"{base}/missing.html"))
+
+    assert [r["status"] for r in results] == [True, True]
+    assert [r["info"]["url"] for r in results] == [
+        f"{base}/clip{n}.mp4" for n in range(2)
+    ]
+    assert "thumbnails" not in results[0]["info"]
+    assert len(missing) == 1 and missing[0]["message"].startswith("ERROR:")
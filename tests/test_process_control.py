@@ -0,0 +1,80 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from process_control import DownloadJob, process_group_kwargs
+
+
+def test_pause_between_library_attempts_stays_paused():
+    job = DownloadJob()
+    job._start()
+    assert job.pause()
+    # The next retry attempt starts while the job is paused
+    job._start()
+    assert job.state == "paused"
+
+    released = threading.Event()
+
+    def hook():
+        job._checkpoint()
+        released.set()
+
+    threading.Thread(target=hook, daemon=True).start()
+    assert not released.wait(0.2)
+    assert job.resume()
+    assert released.wait(2)
+    assert job.state == "running"
+
+
+def test_cancel_while_paused_wakes_checkpoint():
+    job = DownloadJob()
+    job._start()
+    job.pause()
+    assert job.cancel()
+    assert job._checkpoint() is False
+
+
+def process_state(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().rsplit(")", 1)[1].split()[0]
+
+
+def wait_for_state(pid, states, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process_state(pid) in states:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs /proc")
+def test_pause_between_subprocess_attempts_stops_next_child():
+    job = DownloadJob()
+    first = subprocess.Popen(["sleep", "30"], **process_group_kwargs())
+    try:
+        job._attach(first)
+        first.kill()
+        first.wait()
+        job._detach()
+        # Paused during the backoff wait: no process to stop yet
+        assert job.pause()
+
+        second = subprocess.Popen(["sleep", "30"], **process_group_kwargs())
+        try:
+            assert job._attach(second)
+            assert job.state == "paused"
+            assert wait_for_state(second.pid, "T")
+            assert job.resume()
+            assert wait_for_state(second.pid, "SR")
+        finally:
+            second.kill()
+            second.wait()
+    finally:
+        if first.poll() is None:
+            first.kill()
+    job._finish()
+    assert job.state == "finished"
@@ -0,0 +1,79 @@
+import time
+
+from progress_parser import ProgressParser, ProgressRecord
+from progress_throttle import ProgressThrottle
+
+
+def download_line(downloaded, title='"Rick Astley"', video_id="dQw4w9WgXcQ"):
+    return (
+        f"[progress] downloading|{downloaded}|126353408|NA|3365928.96|12|1.5|NA|NA"
+        f'|{video_id}|"a|b.f137.mp4"|"a|b.f137.mp4.part"|{title}\n'
+    )
+
+
+def test_download_line_updates_one_record():
+    parser = ProgressParser()
+    first = parser.parse(download_line(1000))
+    second = parser.parse(download_line(2000))
+    assert first is second is parser.record
+    assert isinstance(second, ProgressRecord)
+    assert second.status == "downloading"
+    assert second.downloaded_bytes == 2000
+    assert second.speed == 3365928.96
+    assert second.filename == "a|b.f137.mp4"
+
+
+def test_as_dict_decodes_every_field():
+    parser = ProgressParser()
+    d = parser.parse(
+        download_line(63176704, title='"T|it\\"le \\u00fc"', video_id="x|y")
+    ).as_dict()
+    assert d["status"] == "downloading"
+    assert d["percent"] == 50
+    assert d["downloaded"] == d["downloaded_bytes"] == 63176704
+    assert d["total"] == d["total_bytes"] == 126353408
+    assert d["total_bytes_estimate"] is None
+    assert d["eta"] == 12
+    assert d["elapsed"] == 1.5
+    assert d["fragment_index"] is None
+    assert d["tmpfilename"] == "a|b.f137.mp4.part"
+    assert d["info_dict"] == {"id": "x|y", "title": 'T|it"le ü'}
+
+
+def test_postprocess_and_other_lines():
+    parser = ProgressParser()
+    assert parser.parse("[youtube] Extracting URL: x\n") is None
+    assert parser.parse("[progress] downloading|1|2\n") is None
+    event = parser.parse(
+        '[progress-json] {"event":"postprocess","progress":{"status":"started",'
+        '"postprocessor":"Merger"},"info":{"id":"x","title":"t","filepath":"f.mp4"}}\n'
+    )
+    d = event.as_dict()
+    assert d["status"] == "converting"
+    assert d["postprocessor"] == "Merger"
+    assert d["filename"] == "f.mp4"
+
+
+class CountingRecord(ProgressRecord):
+    __slots__ = ("built",)
+
+    def as_dict(self):
+        self.built = getattr(self, "built", 0) + 1
+        return super().as_dict()
+
+
+def test_throttle_builds_dicts_only_for_delivered_updates():
+    delivered = []
+    throttle = ProgressThrottle(delivered.append, max_rate=5)
+    parser = ProgressParser()
+    parser.record = record = CountingRecord()
+    for n in range(1, 101):
+        throttle(parser.parse(download_line(n)))
+    assert record.built == 1
+    assert delivered[0]["downloaded_bytes"] == 1
+
+    # The timer delivers the record's latest state
+    time.sleep(0.4)
+    assert record.built == 2
+    assert delivered[-1]["downloaded_bytes"] == 100
+    throttle.flush()
@@ -0,0 +1,217 @@
+import hashlib
+import http.server
+import threading
+
+import pytest
+
+import yt_dlp_downloader
+
+
+class Releases:
+    """A local stand-in for GitHub's releases/latest and releases/download."""
+
+    def __init__(self):
+        self.latest = "2025.01.01"
+        self.assets = {}
+        self.sums = {}
+        self.requests = []
+        # Close the connection after this many bytes of the next binary
+        self.drop_after = None
+
+    def publish(self, tag, size, checksum=None):
+        data = hashlib.sha256(tag.encode()).digest() * (size // 32)
+        self.assets[tag] = data
+        self.sums[tag] = checksum or hashlib.sha256(data).hexdigest()
+        return data
+
+
+def make_handler(releases):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, status, body, headers=()):
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            releases.requests.append((self.path, self.headers.get("Range")))
+            parts = self.path.strip("/").split("/")
+            if parts == ["releases", "latest"]:
+                self.send_response(302)
+                self.send_header("Location", f"/releases/tag/{releases.latest}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            elif parts[:2] == ["releases", "download"] and len(parts) == 4:
+                self.send_asset(parts[2], parts[3])
+            else:
+                self.send_body(404, b"")
+
+        def send_asset(self, tag, name):
+            if tag not in releases.assets:
+                self.send_body(404, b"")
+            elif name == "SHA2-256SUMS":
+                line = f"{releases.sums[tag]}  yt-dlp.exe\n"
+                self.send_body(200, line.encode())
+            else:
+                self.send_binary(releases.assets[tag], f'"{tag}"')
+
+        def send_binary(self, data, etag):
+            start = 0
+            ranged = self.headers.get("Range")
+            if ranged and self.headers.get("If-Range") in (None, etag):
+                start = int(ranged.split("=")[1].split("-")[0])
+            if start >= len(data):
+                headers = [("Content-Range", f"bytes */{len(data)}")]
+                self.send_body(416, b"", headers)
+                return
+            body = data[start:]
+            self.send_response(206 if start else 200)
+            self.send_header("ETag", etag)
+            if start:
+                self.send_header(
+                    "Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}"
+                )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            drop, releases.drop_after = releases.drop_after, None
+            if drop is not None:
+                self.wfile.write(body[:drop])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    return Handler
+
+
+@pytest.fixture
+def releases():
+    releases = Releases()
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), make_handler(releases))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    releases.url = f"http://127.0.0.1:{server.server_port}/releases"
+    yield releases
+    server.shutdown()
+    server.server_close()
+
+
+def binary_requests(releases):
+    return [r for r in releases.requests if r[0].endswith("/yt-dlp.exe")]
+
+
+def update(releases, bin_dir, **kwargs):
+    return yt_dlp_downloader.update_yt_dlp(
+        releases_url=releases.url, bin_dir=bin_dir, **kwargs
+    )
+
+
+def test_installs_latest_and_skips_when_up_to_date(releases, tmp_path):
+    data = releases.publish("2025.01.01", 256 * 1024)
+    result = update(releases, tmp_path)
+    assert result["updated"] is True
+    assert result["version"] == "2025.01.01"
+    assert (tmp_path / "yt-dlp.exe").read_bytes() == data
+
+    releases.requests.clear()
+    result = update(releases, tmp_path, check_interval=0)
+    assert result["updated"] is False
+    assert result["message"] == "yt-dlp 2025.01.01 is up to date"
+    # Only the releases/latest lookup went out
+    assert [path for path, _ in releases.requests] == ["/releases/latest"]
+
+
+def test_checks_are_rate_limited(releases, tmp_path):
+    releases.publish("2025.01.01", 64 * 1024)
+    update(releases, tmp_path)
+    releases.publish("2025.02.02", 64 * 1024)
+    releases.latest = "2025.02.02"
+
+    releases.requests.clear()
+    result = update(releases, tmp_path)
+    assert result["updated"] is False
+    assert result["version"] == "2025.01.01"
+    assert releases.requests == []
+
+    result = update(releases, tmp_path, check_interval=0)
+    assert result["updated"] is True
+    assert result["version"] == "2025.02.02"
+
+
+def test_dropped_download_resumes_with_range(releases, tmp_path):
+    data = releases.publish("2025.01.01", 3 * 1024 * 1024)
+    releases.drop_after = 1024 * 1024
+    progress = []
+
+    result = update(
+        releases, tmp_path, progress_callback=lambda done, total: progress.append(done)
+    )
+
+    assert result["updated"] is True
+    assert (tmp_path / "yt-dlp.exe").read_bytes() == data
+    assert not (tmp_path / "yt-dlp.exe.part").exists()
+    ranges = [header for _, header in binary_requests(releases)]
+    assert ranges[0] is None
+    assert ranges[1] is not None
+    assert int(ranges[1].split("=")[1].split("-")[0]) >= 1024 * 1024
+    assert progress[-1] == len(data)
+    assert "partial" not in yt_dlp_downloader.load_update_state(tmp_path)
+
+
+def test_checksum_mismatch_keeps_installed_binary(releases, tmp_path):
+    old = releases.publish("2025.01.01", 64 * 1024)
+    update(releases, tmp_path)
+    releases.publish("2025.02.02", 64 * 1024, checksum="0" * 64)
+    releases.latest = "2025.02.02"
+
+    with pytest.raises(Exception, match="does not match SHA2-256SUMS"):
+        update(releases, tmp_path, check_interval=0)
+
+    assert (tmp_path / "yt-dlp.exe").read_bytes() == old
+    assert not (tmp_path / "yt-dlp.exe.part").exists()
+    assert yt_dlp_downloader.load_update_state(tmp_path)["version"] == "2025.01.01"
+
+
+def test_unfinished_download_is_resumed_by_a_later_call(releases, tmp_path, monkeypatch):
+    data = releases.publish("2025.01.01", 2 * 1024 * 1024)
+    monkeypatch.setattr(yt_dlp_downloader, "DOWNLOAD_ATTEMPTS", 1)
+    releases.drop_after = 512 * 1024
+    with pytest.raises(Exception):
+        update(releases, tmp_path)
+    assert (tmp_path / "yt-dlp.exe.part").stat().st_size > 0
+
+    releases.requests.clear()
+    update(releases, tmp_path)
+    assert (tmp_path / "yt-dlp.exe").read_bytes() == data
+    assert binary_requests(releases)[0][1] is not None
+
+
+@pytest.mark.parametrize("extra", [0, 1024])
+def test_part_file_answered_416_is_promoted_or_refetched(
+    releases, tmp_path, monkeypatch, extra
+):
+    data = releases.publish("2025.01.01", 2 * 1024 * 1024)
+    monkeypatch.setattr(yt_dlp_downloader, "DOWNLOAD_ATTEMPTS", 1)
+    releases.drop_after = 512 * 1024
+    with pytest.raises(Exception):
+        update(releases, tmp_path)
+    # Complete (or, with extra bytes, longer than the asset) but not renamed
+    (tmp_path / "yt-dlp.exe.part").write_bytes(data + b"x" * extra)
+
+    releases.requests.clear()
+    result = update(releases, tmp_path)
+
+    assert result["updated"] is True
+    assert (tmp_path / "yt-dlp.exe").read_bytes() == data
+    assert not (tmp_path / "yt-dlp.exe.part").exists()
+    expected = [f"bytes={len(data) + extra}-"]
+    if extra:
+        # Not the asset's size: thrown away and fetched whole
+        expected.append(None)
+    assert [header for _, header in binary_requests(releases)] == expected
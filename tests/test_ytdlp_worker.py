@@ -0,0 +1,164 @@
+import multiprocessing
+import subprocess
+import threading
+import time
+
+import pytest
+
+import ytdlp_worker
+from ytdlp_worker import PooledProcess, WorkerPool
+
+
+class FakeProcess:
+    """Stands in for a worker process; kill() closes its end of the pipe."""
+
+    pid = 4242
+    exitcode = -9
+
+    def __init__(self, child_conn):
+        self._child_conn = child_conn
+        self._lock = threading.Lock()
+
+    def kill(self):
+        # The test and the job's reader thread may both kill it
+        with self._lock:
+            if not self._child_conn.closed:
+                self._child_conn.close()
+
+    def join(self, timeout=None):
+        pass
+
+    def is_alive(self):
+        return not self._child_conn.closed
+
+
+class FakeWorker:
+    def __init__(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.child_conn = child_conn
+        self.process = FakeProcess(child_conn)
+        self.alive = True
+
+
+class FakePool:
+    def __init__(self):
+        self.released = []
+
+    def _release(self, worker):
+        self.released.append(worker)
+
+
+def start_job(merge_stderr=False):
+    worker = FakeWorker()
+    pool = FakePool()
+    process = PooledProcess(pool, worker, ["-J", "url"], merge_stderr=merge_stderr)
+    assert worker.child_conn.recv() == ["-J", "url"]
+    return process, worker, pool
+
+
+def call_with_deadline(function, deadline=5):
+    result = {}
+
+    def run():
+        result["value"] = function()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(deadline)
+    assert not thread.is_alive(), "call did not return"
+    return result["value"]
+
+
+def test_communicate_collects_output():
+    process, worker, pool = start_job()
+    worker.child_conn.send(("stdout", "{}\n"))
+    worker.child_conn.send(("stderr", "WARNING: x\n"))
+    worker.child_conn.send(("exit", 0))
+
+    assert call_with_deadline(process.communicate) == ("{}\n", "WARNING: x\n")
+    assert process.returncode == 0
+    assert pool.released == [worker]
+
+
+def test_communicate_after_timeout_and_kill_returns():
+    # get_formats: communicate(timeout) -> TimeoutExpired -> kill() -> communicate()
+    process, worker, pool = start_job()
+    worker.child_conn.send(("stdout", "partial"))
+    worker.child_conn.send(("stderr", "[youtube] url: Downloading webpage\n"))
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        process.communicate(timeout=0.2)
+    process.kill()
+
+    stdout, stderr = call_with_deadline(process.communicate)
+    assert stdout == "partial"
+    assert stderr == "[youtube] url: Downloading webpage\n"
+    assert process.returncode == -9
+    assert not worker.alive
+
+
+def test_communicate_after_timeout_merged_stderr():
+    process, worker, pool = start_job(merge_stderr=True)
+    worker.child_conn.send(("stderr", "line\n"))
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        process.communicate(timeout=0.2)
+    process.kill()
+
+    assert call_with_deadline(process.communicate) == ("line\n", None)
+
+
+def test_full_stream_stops_reading_until_killed(monkeypatch):
+    monkeypatch.setattr(ytdlp_worker, "STREAM_BUFFER_LINES", 2)
+    process, worker, pool = start_job(merge_stderr=True)
+    for number in range(6):
+        worker.child_conn.send(("stdout", f"{number}\n"))
+
+    lines = iter(process.stdout)
+    assert next(lines) == "0\n"
+    time.sleep(0.3)
+    # The reader holds back what does not fit, leaving it in the pipe
+    assert worker.conn.poll()
+
+    process.kill()
+    assert call_with_deadline(process.wait) == -9
+
+
+def test_waiting_run_starts_after_a_killed_job(monkeypatch):
+    workers = []
+
+    def start_worker():
+        workers.append(FakeWorker())
+        return workers[-1]
+
+    pool = WorkerPool(size=1)
+    monkeypatch.setattr(pool, "_start_worker", start_worker)
+    first = pool.run(["url"])
+    waiting = threading.Thread(
+        target=lambda: workers.append(pool.run(["url"])), daemon=True
+    )
+    waiting.start()
+    time.sleep(0.2)
+    assert waiting.is_alive()
+
+    first.kill()
+    waiting.join(5)
+    assert not waiting.is_alive(), "run() still waits for a worker"
+    assert len(workers) == 3
+
+
+def test_grow_wakes_waiting_run(monkeypatch):
+    pool = WorkerPool(size=1)
+    monkeypatch.setattr(pool, "_start_worker", FakeWorker)
+    pool.run(["url"])
+    second = []
+    waiting = threading.Thread(
+        target=lambda: second.append(pool.run(["url"])), daemon=True
+    )
+    waiting.start()
+    time.sleep(0.2)
+    assert waiting.is_alive()
+
+    pool.grow(2)
+    waiting.join(5)
+    assert second and second[0] is not None
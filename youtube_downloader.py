@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import sys
 import subprocess
@@ -28,8 +29,12 @@ from PyQt6.QtGui import (
     QAction,
 )  # Import QAction if needed for custom actions, though standard ones exist
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from download_queue import DownloadQueue
 from downloader import YTVideoDownloader
-from yt_dlp_downloader import download_yt_dlp, get_latest_version
+from performance import DEFAULT_PROFILE, PERFORMANCE_PROFILES
+from process_control import DownloadJob
+from progress_throttle import DEFAULT_PROGRESS_RATE
+from yt_dlp_downloader import update_yt_dlp
 
 
 # --- Format Fetch Thread --- (NEW)
@@ -64,10 +69,14 @@ class UpdateYTDLPThread(QThread):
     def run(self):
         try:
             self.update_progress.emit("Checking for latest version...")
-            version = get_latest_version()
-            self.update_progress.emit(f"Downloading yt-dlp {version}...")
-            result = download_yt_dlp()
-            self.update_finished.emit(True, f"Successfully updated to {version}")
+
+            def on_progress(downloaded, total):
+                if total:
+                    percent = int(downloaded * 100 / total)
+                    self.update_progress.emit(f"Downloading yt-dlp... {percent}%")
+
+            result = update_yt_dlp(progress_callback=on_progress)
+            self.update_finished.emit(result["status"], result["message"])
         except Exception as e:
             self.update_finished.emit(False, f"Update failed: {str(e)}")
 
@@ -76,57 +85,84 @@ class UpdateYTDLPThread(QThread):
 
 
 # --- Download Thread --- (Modified)
+def gui_progress_data(d):
+    """Turn a downloader progress dict into the dict the progress display
+    shows, or None for updates it ignores."""
+    title = "N/A"
+    if d.get("info_dict") and d["info_dict"].get("title"):
+        title = d["info_dict"]["title"]
+    elif d.get("filename"):
+        base = os.path.basename(d["filename"])
+        title = os.path.splitext(base)[0]
+    progress_data = {
+        "percent": 0,
+        "speed": 0,
+        "downloaded": 0,
+        "total": 0,
+        "status": d.get("status", "unknown"),
+        "title": title,
+    }
+    if d.get("status") == "downloading":
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        downloaded = d.get("downloaded_bytes", 0)
+        speed = d.get("speed")
+        if total and downloaded is not None:
+            progress_data["percent"] = int((downloaded / total) * 100)
+            progress_data["total"] = total
+            progress_data["downloaded"] = downloaded
+        if speed is not None:
+            progress_data["speed"] = speed
+        return progress_data
+    elif d.get("status") == "finished":
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        downloaded = d.get("downloaded_bytes")
+        if downloaded is not None:
+            progress_data["total"] = downloaded
+            progress_data["downloaded"] = downloaded
+        elif total is not None:
+            progress_data["total"] = total
+            progress_data["downloaded"] = total
+        progress_data["percent"] = 100
+        progress_data["speed"] = 0
+        progress_data["title"] = title
+        return progress_data
+    return None
+
+
 class DownloadThread(QThread):
     progress_update = pyqtSignal(dict)
     finished = pyqtSignal(dict)
 
     # Add format_string parameter
-    def __init__(self, url, browsers=None, download_dir=None, format_string=None):
+    def __init__(
+        self,
+        url,
+        browsers=None,
+        download_dir=None,
+        format_string=None,
+        fetch_result=None,
+        progress_rate=DEFAULT_PROGRESS_RATE,
+        performance=None,
+        force=False,
+    ):
         super().__init__()
         self.url = url
         self.browsers = browsers if browsers else []
         self.download_dir = download_dir
         self.format_string = format_string  # Store format string
+        self.fetch_result = fetch_result  # get_formats result, skips re-extraction
+        self.progress_rate = progress_rate  # Max progress signals per second
+        self.performance = performance  # Per-job performance profile override
+        self.force = force  # Download even if the archive lists the video
+        self.job = DownloadJob()  # Lets the GUI cancel the running download
+
+    def cancel(self):
+        self.job.cancel()
 
     def run(self):
         def gui_hook(d):
-            title = "N/A"
-            if d.get("info_dict") and d["info_dict"].get("title"):
-                title = d["info_dict"]["title"]
-            elif d.get("filename"):
-                base = os.path.basename(d["filename"])
-                title = os.path.splitext(base)[0]
-            progress_data = {
-                "percent": 0,
-                "speed": 0,
-                "downloaded": 0,
-                "total": 0,
-                "status": d.get("status", "unknown"),
-                "title": title,
-            }
-            if d.get("status") == "downloading":
-                total = d.get("total_bytes") or d.get("total_bytes_estimate")
-                downloaded = d.get("downloaded_bytes", 0)
-                speed = d.get("speed")
-                if total and downloaded is not None:
-                    progress_data["percent"] = int((downloaded / total) * 100)
-                    progress_data["total"] = total
-                    progress_data["downloaded"] = downloaded
-                if speed is not None:
-                    progress_data["speed"] = speed
-                self.progress_update.emit(progress_data)
-            elif d.get("status") == "finished":
-                total = d.get("total_bytes") or d.get("total_bytes_estimate")
-                downloaded = d.get("downloaded_bytes")
-                if downloaded is not None:
-                    progress_data["total"] = downloaded
-                    progress_data["downloaded"] = downloaded
-                elif total is not None:
-                    progress_data["total"] = total
-                    progress_data["downloaded"] = total
-                progress_data["percent"] = 100
-                progress_data["speed"] = 0
-                progress_data["title"] = title
+            progress_data = gui_progress_data(d)
+            if progress_data is not None:
                 self.progress_update.emit(progress_data)
 
         downloader = YTVideoDownloader(
@@ -134,15 +170,102 @@ class DownloadThread(QThread):
             use_rich=False,
             browsers=self.browsers,
             download_dir=self.download_dir,
+            progress_rate=self.progress_rate,
         )
-        # Pass format_string to download_video method
-        result = downloader.download_video(self.url, format_string=self.format_string)
+        # Reuse the already fetched info when we have it for this URL
+        if self.fetch_result:
+            result = downloader.download_fetched(
+                self.fetch_result,
+                format_string=self.format_string,
+                performance=self.performance,
+                job=self.job,
+                force=self.force,
+            )
+        else:
+            result = downloader.download_video(
+                self.url,
+                format_string=self.format_string,
+                performance=self.performance,
+                job=self.job,
+                force=self.force,
+            )
         self.finished.emit(result)
 
 
 # --- End Download Thread ---
 
 
+# --- Playlist Thread ---
+class PlaylistThread(QThread):
+    progress_update = pyqtSignal(dict)
+    entry_finished = pyqtSignal(dict)
+    finished = pyqtSignal(dict)
+
+    def __init__(
+        self,
+        url,
+        browsers=None,
+        download_dir=None,
+        format_string=None,
+        progress_rate=DEFAULT_PROGRESS_RATE,
+        performance=None,
+    ):
+        super().__init__()
+        self.url = url
+        self.browsers = browsers if browsers else []
+        self.download_dir = download_dir
+        self.format_string = format_string
+        self.progress_rate = progress_rate
+        self.performance = performance
+        self.feed = None
+        self._cancelled = False
+        self.counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+
+    def cancel(self):
+        self._cancelled = True
+        if self.feed is not None:
+            self.feed.cancel()
+
+    def run(self):
+        def gui_hook(d):
+            progress_data = gui_progress_data(d)
+            if progress_data is not None:
+                self.progress_update.emit(progress_data)
+
+        def finished_hook(job_id, result):
+            if result.get("skipped"):
+                self.counts["skipped"] += 1
+            elif result["status"]:
+                self.counts["downloaded"] += 1
+            elif not result.get("cancelled"):
+                self.counts["failed"] += 1
+            self.entry_finished.emit(dict(self.counts))
+
+        # One video at a time, so the progress bar follows a single download;
+        # entries are listed and extracted as the queue reaches them
+        with DownloadQueue(
+            max_concurrent=1,
+            progress_hook=gui_hook,
+            finished_hook=finished_hook,
+            browsers=self.browsers,
+            download_dir=self.download_dir,
+            progress_rate=self.progress_rate,
+            performance=self.performance,
+        ) as queue:
+            self.feed = queue.add_playlist(self.url, format_string=self.format_string)
+            if self._cancelled:
+                self.feed.cancel()
+            self.feed.results()  # Blocks until every listed entry is done
+
+        result = dict(self.counts)
+        result["cancelled"] = self._cancelled
+        result["errors"] = list(self.feed.errors)
+        self.finished.emit(result)
+
+
+# --- End Playlist Thread ---
+
+
 class YouTubeDownloaderApp(QWidget):
     def __init__(self):
         super().__init__()
@@ -179,9 +302,12 @@ class YouTubeDownloaderApp(QWidget):
         self.setWindowIcon(QIcon(icon_path))
 
         self.download_thread = None
+        # Progress bar/label repaints per second during a download
+        self.progress_rate = DEFAULT_PROGRESS_RATE
         self.fetched_formats = []
+        self.fetch_result = None
+        self.fetched_url = None
         self.current_video_title = None
-        self.files_before_download = set()
         self.init_ui()
 
     def init_ui(self):
@@ -266,6 +392,10 @@ class YouTubeDownloaderApp(QWidget):
         type_layout.addWidget(self.video_radio)
         type_layout.addWidget(self.audio_radio)
         type_layout.addStretch()
+        # Playlist/channel mode keeps list= in URLs and downloads every entry
+        self.playlist_checkbox = QCheckBox("Playlist / Channel")
+        self.playlist_checkbox.stateChanged.connect(self.toggle_playlist_mode)
+        type_layout.addWidget(self.playlist_checkbox)
 
         # -- Format Selection (Contextual) -- (MODIFIED)
         format_layout = QHBoxLayout()
@@ -340,6 +470,16 @@ class YouTubeDownloaderApp(QWidget):
         self.update_ytdlp_button.setObjectName("UpdateYTDLPButton")
         update_ytdlp_layout.addWidget(self.update_ytdlp_button)
         update_ytdlp_layout.addStretch()
+        # Speed profile (fragment concurrency, chunk size, aria2c)
+        self.performance_label = QLabel("Speed:")
+        self.performance_combo = QComboBox()
+        for profile in PERFORMANCE_PROFILES:
+            self.performance_combo.addItem(profile.capitalize(), profile)
+        self.performance_combo.setCurrentIndex(
+            self.performance_combo.findData(DEFAULT_PROFILE)
+        )
+        update_ytdlp_layout.addWidget(self.performance_label)
+        update_ytdlp_layout.addWidget(self.performance_combo)
         # --- End Folder Section ---
 
         # Add sections to settings layout
@@ -359,6 +499,7 @@ class YouTubeDownloaderApp(QWidget):
         # Apply custom scrollbar style programmatically
         self.style_combobox_scrollbar(self.video_format_combo)
         self.style_combobox_scrollbar(self.audio_format_combo)
+        self.style_combobox_scrollbar(self.performance_combo)
 
         # --- Title Label --- (Add before progress bar)
         self.title_label = QLabel(" ")
@@ -408,11 +549,17 @@ class YouTubeDownloaderApp(QWidget):
         self.download_button.clicked.connect(self.handle_download)
         self.download_button.setFixedHeight(35)  # Set fixed height
 
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_download)
+        self.cancel_button.setFixedHeight(35)  # Set fixed height
+        self.cancel_button.setEnabled(False)
+
         self.open_folder_button = QPushButton("Open Download Folder")
         self.open_folder_button.clicked.connect(self.open_folder)
         self.open_folder_button.setFixedHeight(35)  # Set fixed height
 
         button_layout.addWidget(self.download_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(self.open_folder_button)
         # --- End Buttons Layout ---
 
@@ -633,6 +780,8 @@ class YouTubeDownloaderApp(QWidget):
         self.video_format_combo.addItem("Best Available", "bv")
         self.audio_format_combo.addItem("Best Available", "ba")
         self.fetched_formats = []
+        self.fetch_result = None
+        self.fetched_url = url
         selected_browsers = []
         if self.use_cookies_checkbox.isChecked():
             if self.firefox_checkbox.isChecked():
@@ -649,6 +798,7 @@ class YouTubeDownloaderApp(QWidget):
         self.fetch_formats_button.setText("Fetch Formats")
         self.title_label.setText(" ")
         self.fetched_formats = result.get("formats", [])
+        self.fetch_result = result
         info = result.get("info", {})
         video_title = info.get("title", "Video")
         self.current_video_title = video_title
@@ -762,6 +912,14 @@ class YouTubeDownloaderApp(QWidget):
             size_str = "N/A"
         self.size_label.setText(f"Size: {size_str}")
 
+    def toggle_playlist_mode(self, state):
+        # Formats differ per entry, so they cannot be picked for a playlist
+        playlist_mode = state == Qt.CheckState.Checked.value
+        self.fetch_formats_button.setEnabled(not playlist_mode)
+        if playlist_mode:
+            self.video_format_combo.setCurrentIndex(0)
+            self.audio_format_combo.setCurrentIndex(0)
+
     # --- toggle_browser_checkboxes --- (Modified - no longer needs toggle_format_combos call)
     def toggle_browser_checkboxes(self, state):
         enable = state == Qt.CheckState.Checked.value
@@ -824,8 +982,30 @@ class YouTubeDownloaderApp(QWidget):
             )
             return
 
-        # Track existing files before download
-        self.files_before_download = set(os.listdir(self.current_download_dir))
+        if self.playlist_checkbox.isChecked():
+            self.start_playlist_download(url, format_string, selected_browsers)
+            return
+
+        # Only reuse fetched info if it belongs to the URL being downloaded
+        fetch_result = self.fetch_result if url == self.fetched_url else None
+
+        # The download archive answers instantly, before anything is started
+        fetch_info = fetch_result.get("info") if fetch_result else None
+        entry = YTVideoDownloader(
+            download_dir=self.current_download_dir
+        ).find_downloaded(url, fetch_info)
+        force = False
+        if entry is not None:
+            where = entry["filepath"] or "(recorded in the download archive)"
+            reply = QMessageBox.question(
+                self,
+                "Already Downloaded",
+                f"This video has already been downloaded:\n{where}\n\nDownload it again?",
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                self.last_download_label.setText("Last download: Already downloaded")
+                return
+            force = True
 
         self.title_label.setText("Starting download...")  # Set status
         self.progress.setValue(0)
@@ -840,16 +1020,98 @@ class YouTubeDownloaderApp(QWidget):
             browsers=selected_browsers,
             download_dir=self.current_download_dir,
             format_string=format_string,
+            fetch_result=fetch_result,
+            progress_rate=self.progress_rate,
+            performance=self.performance_combo.currentData(),
+            force=force,
         )
         self.download_thread.progress_update.connect(self.update_progress_display)
         self.download_thread.finished.connect(self.on_download_finished)
         self.download_thread.start()
+        self.cancel_button.setEnabled(True)
 
     # --- End handle_download ---
 
+    def start_playlist_download(self, url, format_string, browsers):
+        # Every entry gets the best video or the chosen audio conversion
+        if format_string not in ("mp3", "wav"):
+            format_string = "mp3" if self.audio_radio.isChecked() else None
+
+        self.title_label.setText("Listing playlist...")
+        self.progress.setValue(0)
+        self.speed_label.setText("Speed: N/A")
+        self.size_label.setText("Size: N/A")
+        self.download_button.setEnabled(False)
+        self.download_button.setText("Downloading...")
+        self.fetch_formats_button.setEnabled(False)
+        self.playlist_checkbox.setEnabled(False)
+
+        self.download_thread = PlaylistThread(
+            url,
+            browsers=browsers,
+            download_dir=self.current_download_dir,
+            format_string=format_string,
+            progress_rate=self.progress_rate,
+            performance=self.performance_combo.currentData(),
+        )
+        self.download_thread.progress_update.connect(self.update_progress_display)
+        self.download_thread.entry_finished.connect(self.on_playlist_entry_finished)
+        self.download_thread.finished.connect(self.on_playlist_finished)
+        self.download_thread.start()
+        self.cancel_button.setEnabled(True)
+
+    def on_playlist_entry_finished(self, counts):
+        self.last_download_label.setText(
+            f"Playlist: {counts['downloaded']} downloaded, "
+            f"{counts['skipped']} already downloaded, {counts['failed']} failed"
+        )
+
+    def on_playlist_finished(self, result):
+        self.cancel_button.setEnabled(False)
+        self.playlist_checkbox.setEnabled(True)
+        self.fetch_formats_button.setEnabled(not self.playlist_checkbox.isChecked())
+        self.download_button.setEnabled(True)
+        self.download_button.setText("Download Now")
+        self.title_label.setText(" ")
+        self.progress.setValue(0)
+        self.speed_label.setText("Speed: N/A")
+        self.size_label.setText("Size: N/A")
+        self.on_playlist_entry_finished(result)
+
+        summary = (
+            f"Downloaded: {result['downloaded']}\n"
+            f"Already downloaded: {result['skipped']}\n"
+            f"Failed: {result['failed']}"
+        )
+        if result["errors"]:
+            summary += f"\nUnavailable entries: {len(result['errors'])}"
+        if result["cancelled"]:
+            QMessageBox.information(self, "Playlist Cancelled", summary)
+        elif result["downloaded"] or result["skipped"]:
+            QMessageBox.information(self, "Playlist Complete", summary)
+        else:
+            QMessageBox.critical(self, "Playlist Failed", summary)
+
+    def cancel_download(self):
+        if self.download_thread and self.download_thread.isRunning():
+            self.cancel_button.setEnabled(False)
+            self.title_label.setText("Cancelling download...")
+            self.download_thread.cancel()
+
     # --- on_download_finished --- (MODIFIED - Added Renaming Logic)
     def on_download_finished(self, result):
-        self.fetch_formats_button.setEnabled(True)
+        self.fetch_formats_button.setEnabled(not self.playlist_checkbox.isChecked())
+        self.cancel_button.setEnabled(False)
+        if result.get("cancelled"):
+            # Partial files were removed with the job's staging dir
+            self.title_label.setText(" ")
+            self.progress.setValue(0)
+            self.speed_label.setText("Speed: N/A")
+            self.size_label.setText("Size: N/A")
+            self.last_download_label.setText("Last download: Cancelled")
+            self.download_button.setEnabled(True)
+            self.download_button.setText("Download Now")
+            return
         if self.title_label.text().startswith("Starting download..."):
             self.title_label.setText(" ")
         self.speed_label.setText("Speed: N/A")
@@ -857,16 +1119,9 @@ class YouTubeDownloaderApp(QWidget):
         new_filepath = None  # To store the path after potential rename
 
         if result["status"] and result["filepath"]:
+            # yt-dlp reports the final path itself (--print after_move:filepath)
             original_filepath = result["filepath"]
 
-            if not os.path.exists(original_filepath):
-                files = [f for f in os.listdir(self.current_download_dir) if os.path.isfile(os.path.join(self.current_download_dir, f))]
-                if files:
-                    files_sorted = sorted(files, key=lambda f: os.path.getmtime(os.path.join(self.current_download_dir, f)), reverse=True)
-                    original_filepath = os.path.join(self.current_download_dir, files_sorted[0])
-                else:
-                    new_filepath = None
-
             if original_filepath and os.path.exists(original_filepath):
                 new_filepath = original_filepath
             else:
@@ -882,23 +1137,8 @@ class YouTubeDownloaderApp(QWidget):
                     size_bytes = os.path.getsize(new_filepath)
                     size_str = self.format_bytes(size_bytes)
                     self.size_label.setText(f"Size: {size_str} / {size_str}")
-
-                    # Delete only temporary files created during this download
-                    try:
-                        current_files = set(os.listdir(self.current_download_dir))
-                        new_files = current_files - self.files_before_download
-                        final_filename = os.path.basename(new_filepath)
-
-                        for filename in new_files:
-                            if filename != final_filename:
-                                filepath = os.path.join(self.current_download_dir, filename)
-                                if os.path.isfile(filepath):
-                                    os.remove(filepath)
-                                    # Removed print to prevent console window
-                    except Exception:
-                        # Removed print to prevent console window
-                        pass
-
+                    # Temporary files stay in the job's staging dir, which
+                    # download_video removes, so there is nothing to clean here
                 except Exception:
                     self.size_label.setText("Size: N/A")  # Reset if error getting size
             else:  # If filepath became None due to rename error
@@ -1073,7 +1313,12 @@ class YouTubeDownloaderApp(QWidget):
 
     # --- Utility Methods ---
     def clean_youtube_url(self, url):
-        """Remove playlist/list parameters from YouTube URL, keep only video ID"""
+        """Remove playlist/list parameters from YouTube URL, keep only video ID
+
+        In playlist/channel mode the URL is kept as entered.
+        """
+        if self.playlist_checkbox.isChecked():
+            return url
         try:
             # Extract video ID from various YouTube URL formats
             # Patterns: watch?v=ID, youtu.be/ID, embed/ID, v/ID
@@ -1165,6 +1410,8 @@ class YouTubeDownloaderApp(QWidget):
 
 
 if __name__ == "__main__":
+    # Needed by the yt-dlp worker pool when running as a frozen executable
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = YouTubeDownloaderApp()
     window.show()
@@ -1,7 +1,28 @@
+import hashlib
+import json
+import os
 import sys
+import time
 import curl_cffi
 from pathlib import Path
 
+import http_client
+
+
+# Point this at a local stand-in (same /latest and /download/<tag>/ layout)
+# to test updates without GitHub.
+RELEASES_URL = os.environ.get(
+    "YT_DLP_RELEASES_URL", "https://github.com/yt-dlp/yt-dlp/releases"
+)
+# Minimum time between two update checks that reach the network
+CHECK_INTERVAL = 15 * 60
+STATE_FILE_NAME = "yt-dlp.state.json"
+# Bytes read from the response per iteration; large chunks keep the Python
+# loop (and the hashing) off the critical path of a ~17 MB download
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Attempts per download; each one resumes the .part file where it stopped
+DOWNLOAD_ATTEMPTS = 4
+
 
 def get_base_dir():
     if getattr(sys, "frozen", False):
@@ -9,38 +30,280 @@ def get_base_dir():
     return Path(__file__).resolve().parent
 
 
-def get_latest_version():
-    url = "https://github.com/yt-dlp/yt-dlp/releases/latest"
-    session = curl_cffi.Session(impersonate="chrome", timeout=60)
-    response = session.get(url, allow_redirects=True)
-    return response.url.split("/")[-1]
+def get_bin_dir():
+    return get_base_dir() / "bin"
+
+
+def load_update_state(bin_dir=None):
+    """Return what is known about the installed yt-dlp.exe.
 
+    Keys: ``version`` (tag of the installed file), ``latest`` and
+    ``checked_at`` (result and time of the last check that reached the
+    network) and, while a download is unfinished, ``partial`` (its tag
+    and ETag/Last-Modified, for resuming). Missing or unreadable state is
+    empty.
+    """
+    path = Path(bin_dir or get_bin_dir()) / STATE_FILE_NAME
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
 
-def download_yt_dlp():
-    base_dir = get_base_dir()
-    bin_dir = base_dir / "bin"
+
+def save_update_state(state, bin_dir=None):
+    bin_dir = Path(bin_dir or get_bin_dir())
     bin_dir.mkdir(exist_ok=True)
-    yt_dlp_path = bin_dir / "yt-dlp.exe"
+    path = bin_dir / STATE_FILE_NAME
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def get_latest_version(releases_url=None):
+    """Return the tag of the latest yt-dlp release.
+
+    Only the ``releases/latest`` redirect is requested; its target names
+    the tag, so the release page itself is never downloaded.
+    """
+    url = f"{releases_url or RELEASES_URL}/latest"
+    response = http_client.get(url, allow_redirects=False)
+    location = response.headers.get("location")
+    if response.status_code in (301, 302, 303, 307, 308) and location:
+        return location.rstrip("/").split("/")[-1]
+    # No redirect (e.g. a proxy followed it already): use the final URL
+    response = http_client.get(url, allow_redirects=True)
+    return response.url.rstrip("/").split("/")[-1]
 
-    version = get_latest_version()
-    download_url = f"https://github.com/yt-dlp/yt-dlp/releases/download/{version}/yt-dlp.exe"
 
-    session = curl_cffi.Session(impersonate="chrome", timeout=120)
-    response = session.get(download_url, stream=True)
+def check_yt_dlp_update(releases_url=None, bin_dir=None, check_interval=CHECK_INTERVAL):
+    """Compare the installed yt-dlp.exe with the latest release.
 
+    Returns ``{"installed", "latest", "update_available", "checked"}``.
+    Within ``check_interval`` seconds of the last check nothing is
+    requested (``checked`` is False) and its result is reused.
+    """
+    bin_dir = Path(bin_dir or get_bin_dir())
+    state = load_update_state(bin_dir)
+    installed = state.get("version") if (bin_dir / "yt-dlp.exe").exists() else None
+    recent = time.time() - state.get("checked_at", 0) < check_interval
+    if recent and state.get("latest"):
+        return {
+            "installed": installed,
+            "latest": state["latest"],
+            "update_available": state["latest"] != installed,
+            "checked": False,
+        }
+
+    latest = get_latest_version(releases_url)
+    state.update(latest=latest, checked_at=time.time())
+    save_update_state(state, bin_dir)
+    return {
+        "installed": installed,
+        "latest": latest,
+        "update_available": latest != installed,
+        "checked": True,
+    }
+
+
+def get_release_checksum(version, releases_url=None, name="yt-dlp.exe"):
+    """Return the SHA-256 of ``name`` listed in the release's SHA2-256SUMS."""
+    url = f"{releases_url or RELEASES_URL}/download/{version}/SHA2-256SUMS"
+    response = http_client.get(url)
     if response.status_code != 200:
-        raise Exception(f"HTTP {response.status_code}")
+        raise Exception(f"Could not fetch SHA2-256SUMS: HTTP {response.status_code}")
+    for line in response.text.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1].lstrip("*") == name:
+            return parts[0].lower()
+    raise Exception(f"No checksum for {name} in SHA2-256SUMS")
+
+
+def _hash_file(path, chunk_size):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(chunk_size):
+            hasher.update(block)
+    return hasher
+
+
+def _fetch_to_part(url, part_path, partial, chunk_size, progress_callback):
+    """Download ``url`` into ``part_path``, resuming it where possible.
+
+    ``partial`` holds the ETag/Last-Modified of the asset the part file
+    came from; it is sent as If-Range, so a changed asset comes back whole,
+    and is updated from the response. A part file the server answers 416
+    (Range Not Satisfiable) for is kept if it has the asset's full size,
+    and otherwise fetched again from the start. Returns the SHA-256 hex
+    digest of the finished part file.
+    """
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    validator = partial.get("etag") or partial.get("last_modified")
+    headers = {}
+    if offset and validator:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+
+    response = http_client.get(url, headers=headers, stream=True)
+    if response.status_code == 416 and offset:
+        response.close()
+        size = response.headers.get("content-range", "").rpartition("/")[2]
+        if size == str(offset):
+            # Complete already; the caller still checks it against the sums
+            if progress_callback:
+                progress_callback(offset, offset)
+            return _hash_file(part_path, chunk_size).hexdigest()
+        part_path.unlink(missing_ok=True)
+        partial["etag"] = partial["last_modified"] = None
+        return _fetch_to_part(url, part_path, partial, chunk_size, progress_callback)
+    try:
+        if response.status_code == 206:
+            hasher = _hash_file(part_path, chunk_size)
+            mode = "ab"
+        elif response.status_code == 200:
+            hasher = hashlib.sha256()
+            offset, mode = 0, "wb"
+        else:
+            raise Exception(f"HTTP {response.status_code}")
+        partial["etag"] = response.headers.get("etag")
+        partial["last_modified"] = response.headers.get("last-modified")
+        length = int(response.headers.get("content-length") or 0)
+        total = offset + length if length else None
 
-    with open(yt_dlp_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
+        downloaded = offset
+        with open(part_path, mode) as f:
 
-    if not yt_dlp_path.exists() or yt_dlp_path.stat().st_size == 0:
-        raise Exception("Download failed")
+            def write(block):
+                nonlocal downloaded
+                f.write(block)
+                hasher.update(block)
+                downloaded += len(block)
+                if progress_callback:
+                    progress_callback(downloaded, total)
 
+            http_client.write_stream(response, write, chunk_size)
+    finally:
+        response.close()
+
+    if total is not None and downloaded != total:
+        raise ConnectionError(f"Connection closed after {downloaded} of {total} bytes")
+    return hasher.hexdigest()
+
+
+def download_yt_dlp(
+    version=None,
+    releases_url=None,
+    bin_dir=None,
+    force=False,
+    chunk_size=DOWNLOAD_CHUNK_SIZE,
+    progress_callback=None,
+    verify=True,
+):
+    """Download yt-dlp.exe ``version`` (default: the latest) into bin/.
+
+    The file is written to yt-dlp.exe.part, resumed with Range requests
+    after a dropped connection (also by a later call), checked against the
+    release's SHA2-256SUMS and only then renamed over yt-dlp.exe, so a
+    failed update never leaves a truncated executable behind.
+
+    Release assets do not change once published, so asking for the
+    installed tag requests nothing; ``force`` downloads it again anyway.
+    ``progress_callback`` is called
+    with ``(downloaded_bytes, total_bytes_or_None)`` every ``chunk_size``
+    bytes. Returns the executable's path.
+    """
+    bin_dir = Path(bin_dir or get_bin_dir())
+    bin_dir.mkdir(exist_ok=True)
+    yt_dlp_path = bin_dir / "yt-dlp.exe"
+    part_path = bin_dir / "yt-dlp.exe.part"
+
+    if version is None:
+        version = get_latest_version(releases_url)
+    download_url = f"{releases_url or RELEASES_URL}/download/{version}/yt-dlp.exe"
+
+    state = load_update_state(bin_dir)
+    if not force and yt_dlp_path.exists() and state.get("version") == version:
+        return str(yt_dlp_path)
+
+    expected = get_release_checksum(version, releases_url) if verify else None
+
+    # A part file is only resumed for the tag it was started for
+    partial = state.get("partial") or {}
+    if partial.get("version") != version:
+        part_path.unlink(missing_ok=True)
+        partial = {"version": version}
+
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        try:
+            digest = _fetch_to_part(
+                download_url, part_path, partial, chunk_size, progress_callback
+            )
+            break
+        except (curl_cffi.CurlError, ConnectionError):
+            # Remember how to resume the part file, also for a later update
+            state["partial"] = partial
+            save_update_state(state, bin_dir)
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise
+            time.sleep(attempt)
+
+    if expected and digest != expected:
+        part_path.unlink(missing_ok=True)
+        state.pop("partial", None)
+        save_update_state(state, bin_dir)
+        raise Exception("Downloaded yt-dlp.exe does not match SHA2-256SUMS")
+
+    os.replace(part_path, yt_dlp_path)
+    state.pop("partial", None)
+    state["version"] = version
+    save_update_state(state, bin_dir)
     return str(yt_dlp_path)
 
 
+def update_yt_dlp(
+    releases_url=None,
+    bin_dir=None,
+    check_interval=CHECK_INTERVAL,
+    force=False,
+    progress_callback=None,
+):
+    """Bring bin/yt-dlp.exe up to date, downloading only when needed.
+
+    Returns ``{"status", "message", "version", "updated", "filepath"}``.
+    ``progress_callback`` is passed to ``download_yt_dlp``.
+    """
+    bin_dir = Path(bin_dir or get_bin_dir())
+    if force:
+        check_interval = 0
+    check = check_yt_dlp_update(releases_url, bin_dir, check_interval)
+    version = check["latest"]
+    filepath = str(bin_dir / "yt-dlp.exe")
+    if not check["update_available"] and not force:
+        return {
+            "status": True,
+            "message": f"yt-dlp {version} is up to date",
+            "version": version,
+            "updated": False,
+            "filepath": filepath,
+        }
+
+    download_yt_dlp(
+        version,
+        releases_url,
+        bin_dir,
+        force=force,
+        progress_callback=progress_callback,
+    )
+    return {
+        "status": True,
+        "message": f"Successfully updated to {version}",
+        "version": version,
+        "updated": True,
+        "filepath": filepath,
+    }
+
+
 if __name__ == "__main__":
-    print(download_yt_dlp())
+    print(update_yt_dlp()["message"])
@@ -0,0 +1,363 @@
+import multiprocessing
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+
+def _worker_main(conn):
+    """Entry point of a pool worker: import yt_dlp once, then run jobs.
+
+    Each job is a yt-dlp argument list. While it runs, everything yt-dlp
+    writes to stdout/stderr is sent back line by line, so the parent sees
+    exactly what a ``yt-dlp.exe`` child would have printed.
+    """
+    if hasattr(os, "setsid"):
+        # Lead a process group so a cancelled job's ffmpeg children can be
+        # killed along with the worker
+        os.setsid()
+    try:
+        import yt_dlp
+    except Exception as e:
+        conn.send(("unavailable", str(e)))
+        return
+    conn.send(("ready", yt_dlp.version.__version__))
+
+    send_lock = threading.Lock()
+    while True:
+        try:
+            argv = conn.recv()
+        except (EOFError, OSError):
+            return
+        if argv is None:
+            return
+
+        out = _PipeWriter(conn, "stdout", send_lock)
+        err = _PipeWriter(conn, "stderr", send_lock)
+        saved = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = out, err
+        try:
+            yt_dlp.main(argv)
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                err.write(f"ERROR: {e.code}\n")
+                code = 1
+        except BaseException as e:
+            err.write(f"ERROR: {e}\n")
+            code = 1
+        finally:
+            out.flush()
+            err.flush()
+            sys.stdout, sys.stderr = saved
+        with send_lock:
+            conn.send(("exit", code))
+
+
+class _PipeWriter:
+    """File-like stdout/stderr replacement that forwards whole lines."""
+
+    encoding = "utf-8"
+    errors = "replace"
+
+    def __init__(self, conn, name, send_lock):
+        self._conn = conn
+        self._name = name
+        self._send_lock = send_lock
+        self._buffer = ""
+
+    def write(self, text):
+        self._buffer += text
+        if "\n" in self._buffer:
+            *lines, self._buffer = self._buffer.split("\n")
+            with self._send_lock:
+                for line in lines:
+                    self._conn.send((self._name, line + "\n"))
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            with self._send_lock:
+                self._conn.send((self._name, self._buffer))
+            self._buffer = ""
+
+    def isatty(self):
+        return False
+
+
+# Lines a job's stream holds before the reader thread stops taking more
+# from the worker; the worker then blocks on its pipe, as a yt-dlp.exe
+# child blocks on a full stdout pipe
+STREAM_BUFFER_LINES = 1024
+
+
+class _LineStream:
+    """Iterable of output lines fed by the worker's reader thread."""
+
+    def __init__(self):
+        self._lines = queue.Queue(STREAM_BUFFER_LINES)
+        self._discard = threading.Event()
+
+    def put(self, line):
+        """Queue a line, waiting while the buffer is full. Once the job is
+        killed, lines nobody reads are dropped; the end marker (None) always
+        gets through."""
+        while True:
+            try:
+                self._lines.put(line, timeout=0.1)
+                return
+            except queue.Full:
+                if not self._discard.is_set():
+                    continue
+                if line is not None:
+                    return
+                try:
+                    self._lines.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def discard(self):
+        self._discard.set()
+
+    def __iter__(self):
+        while True:
+            line = self._lines.get()
+            if line is None:
+                return
+            yield line
+
+    def read(self):
+        return "".join(self)
+
+
+class PooledProcess:
+    """Popen-like handle for one job running in a pool worker."""
+
+    def __init__(self, pool, worker, argv, merge_stderr=False):
+        self.args = argv
+        self.pid = worker.process.pid
+        self.returncode = None
+        self.stdout = _LineStream()
+        self.stderr = None if merge_stderr else _LineStream()
+        self._pool = pool
+        self._worker = worker
+        self._done = threading.Event()
+        self._readers = None
+        self._output = {}
+        worker.conn.send(list(argv))
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        code = -1
+        try:
+            while True:
+                kind, payload = self._worker.conn.recv()
+                if kind == "exit":
+                    code = payload
+                    break
+                if kind == "stderr" and self.stderr is not None:
+                    self.stderr.put(payload)
+                else:
+                    self.stdout.put(payload)
+        except (EOFError, OSError):
+            # The worker died or was killed mid-job
+            self._worker.alive = False
+            self._worker.process.join(1)
+            if self._worker.process.exitcode is not None:
+                code = self._worker.process.exitcode
+        self.stdout.put(None)
+        if self.stderr is not None:
+            self.stderr.put(None)
+        self.returncode = code
+        self._pool._release(self._worker)
+        self._done.set()
+
+    def poll(self):
+        return self.returncode if self._done.is_set() else None
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def communicate(self, timeout=None):
+        # The readers are started once per job: after a timeout the caller
+        # kills the job and calls again, and the first call's readers still
+        # own the streams (and would take their end-of-stream markers)
+        if self._readers is None:
+            self._readers = [self._start_reader("stdout", self.stdout)]
+            if self.stderr is not None:
+                self._readers.append(self._start_reader("stderr", self.stderr))
+        self.wait(timeout)
+        for reader in self._readers:
+            reader.join()
+        stderr = self._output["stderr"] if self.stderr is not None else None
+        return self._output["stdout"], stderr
+
+    def _start_reader(self, name, stream):
+        def read():
+            self._output[name] = stream.read()
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        return reader
+
+    def kill(self):
+        """Stop the job. The worker is discarded and replaced on demand."""
+        if self._done.is_set():
+            return
+        self._worker.alive = False
+        self.stdout.discard()
+        if self.stderr is not None:
+            self.stderr.discard()
+        self._worker.process.kill()
+
+    terminate = kill
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.alive = True
+
+
+# Workers of the shared pool unless a caller asks for more
+DEFAULT_POOL_SIZE = 2
+
+
+class WorkerPool:
+    """A few long-lived processes that each host the ``yt_dlp`` module.
+
+    Jobs are yt-dlp argument lists sent over a multiprocessing pipe, which
+    saves the interpreter start-up and import time a fresh ``yt-dlp.exe``
+    pays on every call. ``run`` blocks until a worker is free; at most
+    ``size`` workers exist at once.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE):
+        self.size = max(1, int(size))
+        self._context = multiprocessing.get_context("spawn")
+        # Guards the idle workers and the worker count; notified whenever a
+        # worker is returned or discarded, so a waiting run() can proceed
+        self._cond = threading.Condition()
+        self._idle = []
+        self._count = 0
+        self.available = True
+        self.version = None
+        self.error = None
+
+    def _start_worker(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        try:
+            kind, payload = parent_conn.recv()
+        except (EOFError, OSError) as e:
+            kind, payload = "unavailable", str(e)
+        if kind != "ready":
+            process.join(5)
+            self.available = False
+            self.error = payload
+            return None
+        self.version = payload
+        return _Worker(process, parent_conn)
+
+    def grow(self, size):
+        """Allow at least ``size`` workers."""
+        with self._cond:
+            if size > self.size:
+                self.size = size
+                self._cond.notify_all()
+
+    def _acquire(self):
+        while True:
+            with self._cond:
+                while not self._idle and self._count >= self.size:
+                    self._cond.wait()
+                worker = self._idle.pop() if self._idle else None
+                if worker is None:
+                    self._count += 1
+            if worker is None:
+                worker = self._start_worker()
+                if worker is None:
+                    with self._cond:
+                        self._count -= 1
+                        self._cond.notify()
+                return worker
+            if worker.alive and worker.process.is_alive():
+                return worker
+            self._discard(worker)
+
+    def _release(self, worker):
+        if worker.alive and worker.process.is_alive():
+            with self._cond:
+                self._idle.append(worker)
+                self._cond.notify()
+        else:
+            self._discard(worker)
+
+    def _discard(self, worker):
+        try:
+            worker.conn.close()
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.process.join(1)
+        except OSError:
+            pass
+        finally:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+
+    def run(self, argv, merge_stderr=False):
+        """Start a yt-dlp job and return a Popen-like PooledProcess.
+
+        Returns None when the pool cannot host yt-dlp (module missing).
+        """
+        if not self.available:
+            return None
+        worker = self._acquire()
+        if worker is None:
+            return None
+        return PooledProcess(self, worker, argv, merge_stderr=merge_stderr)
+
+    def shutdown(self):
+        while True:
+            with self._cond:
+                if not self._idle:
+                    break
+                worker = self._idle.pop()
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(2)
+            self._discard(worker)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_worker_pool(size=None):
+    """Return the process-wide worker pool, created on first use.
+
+    ``size`` is the number of workers the caller needs at once; the pool
+    grows to it (it never shrinks). It starts with ``DEFAULT_POOL_SIZE``.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WorkerPool(size=size or DEFAULT_POOL_SIZE)
+        elif size:
+            _default_pool.grow(size)
+        return _default_pool